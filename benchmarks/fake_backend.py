@@ -0,0 +1,501 @@
+"""Local stand-in for the LG Horizon REST and MQTT endpoints.
+The REST side is a real HTTP server on localhost, the api is pointed at it
+through the country settings of the lghorizon library. The MQTT broker is
+only reachable over TLS websockets on port 443, so the mqtt client of the
+library is replaced by an in-process broker that delivers its messages from
+its own thread, like paho does, and answers commands the way a box would.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import queue
+import re
+import threading
+import time
+from typing import Any
+from urllib.parse import urlparse
+
+import lghorizon.const
+import lghorizon.lghorizon_api
+
+ONLINE_RUNNING = lghorizon.const.ONLINE_RUNNING
+ONLINE_STANDBY = lghorizon.const.ONLINE_STANDBY
+COUNTRY_CODE = "nl"
+SERVICES = (
+    "authorizationService",
+    "mqttBroker",
+    "personalizationService",
+    "linearService",
+    "recordingService",
+    "purchaseService",
+    "vodService",
+    "epgService",
+)
+# Length of the programmes in the simulated guide, in seconds.
+PROGRAMME_SECONDS = 45 * 60
+
+
+@dataclass
+class FakeBackendConfig:
+    """Size of the simulated accounts."""
+
+    accounts: int = 1
+    boxes: int = 2
+    channels: int = 100
+    recordings: int = 500
+    episodes: int = 10
+    # Delay added to every REST response, in seconds.
+    latency: float = 0.0
+    # Delay before a box answers an mqtt command, in seconds.
+    box_latency: float = 0.02
+
+
+@dataclass
+class FakeBox:
+    """State of a simulated box."""
+
+    device_id: str
+    state: str = ONLINE_RUNNING
+    channel: int = 1
+    speed: int = 1
+    event: int = 0
+
+
+@dataclass
+class FakeHousehold:
+    """A simulated account."""
+
+    household_id: str
+    username: str
+    boxes: dict[str, FakeBox] = field(default_factory=dict)
+
+
+class FakeBackend:
+    """Serves the REST endpoints and simulates the boxes."""
+
+    def __init__(self, config: FakeBackendConfig) -> None:
+        """Init the backend."""
+        self.config = config
+        self.households: dict[str, FakeHousehold] = {}
+        for account in range(config.accounts):
+            household = FakeHousehold(f"household{account}", f"user{account}")
+            for box in range(config.boxes):
+                device_id = f"3C36E4-EOSSTB-{account:04}{box:04}"
+                household.boxes[device_id] = FakeBox(device_id)
+            self.households[household.household_id] = household
+        self.rest_calls: dict[str, int] = {}
+        self.images_sent = 0
+        self.images_not_modified = 0
+        self.broker = FakeBroker(self)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._saved_settings: dict[str, Any] | None = None
+
+    @property
+    def url(self) -> str:
+        """Return the base url of the REST server."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> None:
+        """Start serving and point the lghorizon library at this backend."""
+        self._thread.start()
+        self.broker.start()
+        settings = lghorizon.const.COUNTRY_SETTINGS[COUNTRY_CODE]
+        self._saved_settings = dict(settings)
+        settings["api_url"] = self.url
+        lghorizon.lghorizon_api.LGHorizonMqttClient = self.broker.client_factory
+
+    def stop(self) -> None:
+        """Stop serving and restore the library."""
+        self._server.shutdown()
+        self.broker.stop()
+        if self._saved_settings is not None:
+            lghorizon.const.COUNTRY_SETTINGS[COUNTRY_CODE].update(self._saved_settings)
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path.startswith("/images/"):
+                    self._respond_image()
+                    return
+                self._respond(backend.handle("GET", self.path, None))
+
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                self._respond(backend.handle("POST", self.path, body))
+
+            def _respond(self, payload: Any) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(200 if payload is not None else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _respond_image(self) -> None:
+                # Every image keeps its content, and so its ETag.
+                etag = f'"{abs(hash(self.path))}"'
+                if self.headers.get("If-None-Match") == etag:
+                    backend.images_not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                backend.images_sent += 1
+                data = self.path.encode() * 64
+                content_type = (
+                    "image/png" if self.path.endswith(".png") else "image/jpeg"
+                )
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    def handle(self, method: str, raw_path: str, body: Any) -> Any:
+        """Return the response for a REST call."""
+        if self.config.latency:
+            time.sleep(self.config.latency)
+        path = urlparse(raw_path).path
+        endpoint = "/".join(
+            (
+                "{id}"
+                if re.search(r"\d", part) and not re.fullmatch(r"v\d", part)
+                else part
+            )
+            for part in path.split("/")
+        )
+        self.rest_calls[endpoint] = self.rest_calls.get(endpoint, 0) + 1
+
+        if path.endswith("backoffice.json"):
+            return {name: {"URL": f"{self.url}/{name}"} for name in SERVICES}
+        if path.endswith("/auth-service/v1/authorization"):
+            household = self._household_of_user(body["username"])
+            return {
+                "householdId": household.household_id,
+                "accessToken": "access",
+                "refreshToken": "refresh",
+                "username": household.username,
+                "refreshTokenExpiry": int(time.time()) + 3600,
+            }
+        if path.endswith("/v1/mqtt/token"):
+            return {"token": "mqtt"}
+        if match := re.search(r"/v1/customer/(\w+)$", path):
+            return self._customer(self.households[match[1]])
+        if path.endswith("/entitlements"):
+            return {"entitlements": [{"id": "basic"}]}
+        if path.endswith("/v2/channels"):
+            return [self._channel(number) for number in self._channel_numbers()]
+        if match := re.search(r"/v2/replayEvent/(\d+)-(\d+)$", path):
+            return {
+                "channelId": f"NL_{int(match[1]):06}",
+                "eventId": f"{match[1]}-{match[2]}",
+                "title": f"Programme {match[2]} on {match[1]}",
+            }
+        if match := re.search(r"/events/segments/(\d{14})$", path):
+            return self._segment(match[1])
+        if path.endswith("/quota"):
+            return {"quota": 1000, "occupied": 420}
+        if path.endswith("/recordings"):
+            return {"data": [self._recording(i) for i in range(self.config.recordings)]}
+        if match := re.search(r"/episodes/shows/([\w-]+)$", path):
+            return {
+                "data": [
+                    self._episode(match[1], number)
+                    for number in range(1, self.config.episodes + 1)
+                ]
+            }
+        return None
+
+    def _household_of_user(self, username: str) -> FakeHousehold:
+        for household in self.households.values():
+            if household.username == username:
+                return household
+        raise KeyError(username)
+
+    def _channel_numbers(self) -> range:
+        return range(1, self.config.channels + 1)
+
+    def _customer(self, household: FakeHousehold) -> dict[str, Any]:
+        return {
+            "customerId": household.household_id,
+            "hashedCustomerId": household.household_id,
+            "countryId": COUNTRY_CODE,
+            "cityId": 1,
+            "assignedDevices": [
+                {
+                    "deviceId": box.device_id,
+                    "hashedCPEId": box.device_id,
+                    "platformType": "EOS",
+                    "settings": {"deviceFriendlyName": f"Box {box.device_id[-4:]}"},
+                }
+                for box in household.boxes.values()
+            ],
+        }
+
+    def _channel(self, number: int) -> dict[str, Any]:
+        return {
+            "id": f"NL_{number:06}",
+            "name": f"Channel {number}",
+            "logicalChannelNumber": number,
+            "linearProducts": ["basic"],
+            "imageStream": {"full": f"{self.url}/images/stream/{number}.jpg"},
+            "logo": {"focused": f"{self.url}/images/logo/{number}.png"},
+        }
+
+    def _segment(self, stamp: str) -> dict[str, Any]:
+        start = int(
+            datetime.strptime(stamp, "%Y%m%d%H%M%S")
+            .replace(tzinfo=timezone.utc)
+            .timestamp()
+        )
+        end = start + 6 * 3600
+        first = start - start % PROGRAMME_SECONDS
+        return {
+            "entries": [
+                {
+                    "channelId": f"NL_{number:06}",
+                    "events": [
+                        {
+                            "id": f"{number}-{begin}",
+                            "title": f"Programme {begin // PROGRAMME_SECONDS}",
+                            "startTime": begin,
+                            "endTime": begin + PROGRAMME_SECONDS,
+                        }
+                        for begin in range(first, end, PROGRAMME_SECONDS)
+                    ],
+                }
+                for number in self._channel_numbers()
+            ]
+        }
+
+    def _recording(self, number: int) -> dict[str, Any]:
+        recording = {
+            "id": f"recording-{number}",
+            "title": f"{chr(ord('A') + number % 26)}recording {number}",
+            "poster": {"url": f"{self.url}/images/poster/{number}.jpg"},
+            "channelId": f"NL_{number % self.config.channels + 1:06}",
+        }
+        if number % 4 == 0:
+            recording.update(type="season", showId=f"show-{number}")
+        else:
+            recording.update(type="single")
+        return recording
+
+    def _episode(self, show_id: str, number: int) -> dict[str, Any]:
+        return {
+            "source": "single",
+            "episodeId": f"{show_id}-episode-{number}",
+            "episodeTitle": f"Episode {number}",
+            "showTitle": f"Show {show_id}",
+            "recordingState": "recorded",
+            "seasonNumber": 1,
+            "episodeNumber": number,
+            "poster": {"url": f"{self.url}/images/episode/{number}.jpg"},
+        }
+
+
+class FakeBroker:
+    """In-process mqtt broker that behaves like the boxes of the backend."""
+
+    def __init__(self, backend: FakeBackend) -> None:
+        """Init the broker."""
+        self.backend = backend
+        self.clients: list[FakeMqttClient] = []
+        self.published = 0
+        self.delivered = 0
+        # Boxes only announce themselves and do not answer commands.
+        self.silent = False
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._deliver, daemon=True)
+
+    def client_factory(self, auth, url, on_connected=None, on_message=None):
+        """Create a client, called by the api in place of LGHorizonMqttClient."""
+        client = FakeMqttClient(self, auth, on_connected, on_message)
+        self.clients.append(client)
+        return client
+
+    def start(self) -> None:
+        """Start delivering messages."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop delivering messages."""
+        self._queue.put(None)
+
+    def send(self, household_id: str, topic: str, payload: Any, delay=0.0) -> None:
+        """Deliver a message to the clients of a household."""
+        self._queue.put((time.monotonic() + delay, household_id, topic, payload))
+
+    def drop(self) -> None:
+        """Drop the connection of every client, as an outage would."""
+        for client in self.clients:
+            client.connected = False
+
+    def burst(self, messages: int) -> None:
+        """Send status updates for all boxes, as a busy household would."""
+        for number in range(messages):
+            for household in self.backend.households.values():
+                for box in household.boxes.values():
+                    box.event = number % 4
+                    self._send_status(household, box)
+
+    def _deliver(self) -> None:
+        while (item := self._queue.get()) is not None:
+            due, household_id, topic, payload = item
+            if (wait := due - time.monotonic()) > 0:
+                time.sleep(wait)
+            for client in list(self.clients):
+                if client.household_id == household_id and client.connected:
+                    self.delivered += 1
+                    client.deliver(topic, payload)
+            self._queue.task_done()
+
+    def join(self) -> None:
+        """Wait until every message sent so far was delivered."""
+        self._queue.join()
+
+    def publish(self, client: FakeMqttClient, topic: str, payload: str) -> None:
+        """Handle a message published by a client."""
+        self.published += 1
+        household = self.backend.households[client.household_id]
+        message = json.loads(payload)
+        parts = topic.split("/")
+        if len(parts) == 3 and parts[2] == "status":
+            # A client came online, the boxes announce themselves.
+            for box in household.boxes.values():
+                self._send_state(household, box)
+            return
+        box = household.boxes.get(parts[1])
+        if box is None or self.silent:
+            return
+        command = message.get("type")
+        if command == "CPE.getUiStatus":
+            self._send_status(household, box)
+        elif command == "CPE.capacity":
+            self.send(
+                household.household_id,
+                f"{household.household_id}/{box.device_id}/localRecordings/capacity",
+                {"CPE.capacity": True, "used": 42},
+                self.backend.config.box_latency,
+            )
+        elif command == "CPE.pushToTV":
+            channel_id = message["status"]["source"].get("channelId")
+            if channel_id:
+                box.channel = int(channel_id.split("_")[1])
+                self._send_status(household, box)
+        elif command == "CPE.KeyEvent":
+            self._press_key(household, box, message["status"]["w3cKey"])
+
+    def _press_key(self, household: FakeHousehold, box: FakeBox, key: str) -> None:
+        channels = self.backend.config.channels
+        if key == "Power":
+            box.state = (
+                ONLINE_STANDBY if box.state == ONLINE_RUNNING else ONLINE_RUNNING
+            )
+            self._send_state(household, box)
+            return
+        if key == "ChannelUp":
+            box.channel = box.channel % channels + 1
+        elif key == "ChannelDown":
+            box.channel = (box.channel - 2) % channels + 1
+        elif key == "MediaPlayPause":
+            box.speed = 0 if box.speed else 1
+        else:
+            return
+        self._send_status(household, box)
+
+    def _send_state(self, household: FakeHousehold, box: FakeBox) -> None:
+        self.send(
+            household.household_id,
+            f"{household.household_id}/{box.device_id}/status",
+            {"source": box.device_id, "deviceType": "STB", "state": box.state},
+            self.backend.config.box_latency,
+        )
+
+    def _send_status(self, household: FakeHousehold, box: FakeBox) -> None:
+        self.send(
+            household.household_id,
+            f"{household.household_id}/{box.device_id}/status",
+            {
+                "source": box.device_id,
+                "status": {
+                    "uiStatus": "mainUI",
+                    "playerState": {
+                        "sourceType": "linear",
+                        "speed": box.speed,
+                        "source": {"eventId": f"{box.channel}-{box.event}"},
+                    },
+                },
+            },
+            self.backend.config.box_latency,
+        )
+
+
+class _PahoClient:
+    """The part of the paho client the integration looks at."""
+
+    def __init__(self, client: FakeMqttClient) -> None:
+        self._client = client
+
+    def is_connected(self) -> bool:
+        return self._client.connected
+
+    def loop_stop(self) -> None:
+        pass
+
+
+class FakeMqttClient:
+    """Stands in for LGHorizonMqttClient."""
+
+    def __init__(self, broker: FakeBroker, auth, on_connected, on_message) -> None:
+        """Init the client."""
+        self._broker = broker
+        self._auth = auth
+        self.clientId = f"client{len(broker.clients)}"
+        self._on_connected_callback = on_connected
+        self._on_message_callback = on_message
+        self._mqtt_client = _PahoClient(self)
+        self.connected = False
+
+    @property
+    def household_id(self) -> str:
+        """Return the household the client subscribed to."""
+        return self._auth.householdId
+
+    @property
+    def is_connected(self) -> bool:
+        """Return True if connected."""
+        return self.connected
+
+    def connect(self) -> None:
+        """Connect to the broker."""
+        self.connected = True
+        if self._on_connected_callback:
+            threading.Thread(target=self._on_connected_callback, daemon=True).start()
+
+    def disconnect(self) -> None:
+        """Disconnect from the broker."""
+        self.connected = False
+
+    def publish_message(self, topic: str, json_payload: str) -> None:
+        """Publish a message."""
+        self._broker.publish(self, topic, json_payload)
+
+    def deliver(self, topic: str, payload: Any) -> None:
+        """Hand a message to the api."""
+        if self._on_message_callback:
+            self._on_message_callback(payload, topic)
@@ -0,0 +1,246 @@
+"""Replay a traffic capture against the LG Horizon integration.
+
+Feeds the mqtt messages and REST responses written by the start_capture
+service back into the integration of this checkout, at the recorded pace
+or faster, without network. The boxes and channels of the capture are
+served by the fake backend, which answers anything the capture does not
+hold. Prints the results as JSON.
+
+    python benchmarks/replay.py capture.jsonl.gz --speed 10
+    python benchmarks/replay.py capture.jsonl.gz --speed 0 --profile replay.prof
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import deque
+import cProfile
+import gzip
+import json
+import logging
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fake_backend import FakeBackend, FakeBackendConfig, FakeBox  # noqa: E402
+from run import (  # noqa: E402
+    DOMAIN,
+    LoopLagMonitor,
+    StateWriteCounter,
+    _async_boot,
+    _async_wait_connected,
+    _async_wait_quiet,
+)
+
+from custom_components.lghorizon.capture import (  # noqa: E402
+    CAPTURE_VERSION,
+    HOUSEHOLD_PLACEHOLDER,
+    replace_household,
+    service_path,
+)
+from custom_components.lghorizon.const import METRICS  # noqa: E402
+from homeassistant import config_entries  # noqa: E402
+from lghorizon.lghorizon_api import LGHorizonApi  # noqa: E402
+
+
+def load_capture(path: str) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """Return the header and the records of a capture."""
+    with gzip.open(path, "rt", encoding="utf-8") as capture_file:
+        records = [json.loads(line) for line in capture_file if line.strip()]
+    if not records or records[0].get("type") != "header":
+        raise ValueError(f"{path} is not a capture")
+    header = records[0]
+    if header["version"] > CAPTURE_VERSION:
+        raise ValueError(f"{path} has unsupported version {header['version']}")
+    return header, sorted(records[1:], key=lambda record: record["t"])
+
+
+class CapturedResponses:
+    """Answers the REST calls of the api with the captured responses.
+
+    Responses are matched on their path relative to their service and handed
+    out in the recorded order, the last one repeats. Calls the capture does
+    not hold go to the fake backend.
+    """
+
+    def __init__(self, records: list[dict[str, Any]]) -> None:
+        """Init the responses."""
+        self._responses: dict[str, deque] = {}
+        for record in records:
+            if record["type"] == "rest":
+                key = urlsplit(record["url"]).path
+                self._responses.setdefault(key, deque()).append(record["response"])
+        self.served = 0
+        self.passed = 0
+        self._original = LGHorizonApi._do_api_call
+
+    def add_default(self, path: str, response: Any) -> None:
+        """Serve response for path when the capture holds none."""
+        self._responses.setdefault(path, deque([response]))
+
+    def install(self) -> None:
+        """Route the REST calls of every api through the capture."""
+        responses = self
+
+        def do_api_call(api: LGHorizonApi, url: str, tries: int = 0) -> Any:
+            path = service_path(api._config or {}, url)
+            # The config is fetched before the api knows its household.
+            household_id = getattr(api._auth, "householdId", None)
+            if household_id:
+                path = path.replace(household_id, HOUSEHOLD_PLACEHOLDER)
+            queued = responses._responses.get(urlsplit(path).path)
+            if not queued:
+                responses.passed += 1
+                return responses._original(api, url, tries)
+            responses.served += 1
+            return queued.popleft() if len(queued) > 1 else queued[0]
+
+        LGHorizonApi._do_api_call = do_api_call
+
+    def uninstall(self) -> None:
+        """Restore the api."""
+        LGHorizonApi._do_api_call = self._original
+
+
+def _channel(channel: list[Any]) -> dict[str, Any]:
+    channel_id, title, number, logo_image, stream_image = channel
+    return {
+        "id": channel_id,
+        "name": title,
+        "logicalChannelNumber": number,
+        "linearProducts": ["basic"],
+        "imageStream": {"full": stream_image},
+        "logo": {"focused": logo_image},
+    }
+
+
+async def async_replay(args: argparse.Namespace) -> dict[str, Any]:
+    """Replay the capture and return the results."""
+    header, records = load_capture(args.capture)
+    snapshot = header["snapshot"]
+    messages = [record for record in records if record["type"] == "mqtt"]
+
+    backend = FakeBackend(FakeBackendConfig(accounts=1, boxes=0, recordings=0))
+    household = next(iter(backend.households.values()))
+    for record in records:
+        body = "message" if record["type"] == "mqtt" else "response"
+        record[body] = replace_household(
+            record[body], HOUSEHOLD_PLACEHOLDER, household.household_id
+        )
+    for box in snapshot["boxes"]:
+        household.boxes[box["deviceId"]] = FakeBox(box["deviceId"])
+    backend.broker.silent = True
+    responses = CapturedResponses(records)
+    responses.add_default(
+        "linearService/v2/channels", [_channel(ch) for ch in snapshot["channels"]]
+    )
+    responses.install()
+    backend.start()
+
+    hass = await _async_boot(tempfile.mkdtemp(prefix="lghorizon-replay-"))
+    lag = LoopLagMonitor(hass)
+    lag.start()
+    counter = StateWriteCounter(hass)
+    entry = config_entries.ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title=household.username,
+        data={
+            "country_code": "Ziggo",
+            "username": household.username,
+            "password": "password",
+        },
+        source="user",
+        options={},
+    )
+    results: dict[str, Any] = {
+        "capture": {
+            "file": Path(args.capture).name,
+            "started": header["started"],
+            "country_code": header["country_code"],
+            "boxes": len(snapshot["boxes"]),
+            "mqtt_messages": len(messages),
+            "rest_responses": len(records) - len(messages),
+            "duration_s": records[-1]["t"] if records else 0,
+        },
+        "speed": args.speed,
+    }
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        await hass.config_entries.async_add(entry)
+        await _async_wait_connected(hass, [entry])
+        await _async_wait_quiet(hass, counter)
+        writes_before = counter.writes
+        delivered_before = backend.broker.delivered
+
+        phase: dict[str, Any] = {}
+        with lag.phase(phase):
+            if profiler:
+                profiler.enable()
+            start = time.monotonic()
+            first = messages[0]["t"] if messages else 0
+            for record in messages:
+                due = (record["t"] - first) / args.speed if args.speed else 0
+                backend.broker.send(
+                    household.household_id,
+                    record["topic"].replace(
+                        HOUSEHOLD_PLACEHOLDER, household.household_id
+                    ),
+                    record["message"],
+                    max(due - (time.monotonic() - start), 0),
+                )
+            await hass.async_add_executor_job(backend.broker.join)
+            await hass.async_block_till_done()
+            phase["replay_s"] = round(time.monotonic() - start, 4)
+            # Coalesced state writes are still pending.
+            counter.last_write = time.monotonic()
+            await _async_wait_quiet(hass, counter)
+            if profiler:
+                profiler.disable()
+        phase["delivered"] = backend.broker.delivered - delivered_before
+        phase["state_writes"] = counter.writes - writes_before
+        results["replay"] = phase
+        results["rest"] = {"captured": responses.served, "fake": responses.passed}
+        metrics = hass.data[DOMAIN][entry.entry_id][METRICS]
+        results["metrics"] = metrics.as_dict()
+    finally:
+        lag.stop()
+        await hass.async_stop(force=True)
+        backend.stop()
+        responses.uninstall()
+    if profiler:
+        profiler.dump_stats(args.profile)
+        results["profile"] = args.profile
+    return results
+
+
+def main() -> None:
+    """Parse the arguments and replay the capture."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="file written by the start_capture service")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="times the recorded pace, 0 replays as fast as possible",
+    )
+    parser.add_argument(
+        "--profile", help="write cProfile stats of the replay to this file"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(asyncio.run(async_replay(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
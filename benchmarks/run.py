@@ -0,0 +1,384 @@
+"""Benchmark the LG Horizon integration against a local fake backend.
+
+Runs Home Assistant in process with the integration of this checkout, sets
+up the configured number of accounts against the fake backend and writes
+the results as JSON to --output, or prints them. Needs homeassistant and
+lghorizon to be installed.
+
+    python benchmarks/run.py --accounts 2 --boxes 3 --recordings 2000
+    python benchmarks/run.py --output new.json --compare old.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from contextlib import contextmanager
+import json
+import logging
+import os
+from pathlib import Path
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fake_backend import FakeBackend, FakeBackendConfig  # noqa: E402
+
+from homeassistant import config_entries, loader  # noqa: E402
+from homeassistant.auth import auth_manager_from_config  # noqa: E402
+from homeassistant.core import CoreState, HomeAssistant  # noqa: E402
+from homeassistant.helpers import (  # noqa: E402
+    area_registry as ar,
+    device_registry as dr,
+    entity_registry as er,
+)
+from homeassistant.setup import async_setup_component  # noqa: E402
+
+DOMAIN = "lghorizon"
+MEDIA_PLAYER = "media_player"
+LAG_INTERVAL = 0.01
+QUIET_PERIOD = 1.0
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up a sleeping task."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = self.hass.loop.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        loop = self.hass.loop
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.samples.append(loop.time() - start - LAG_INTERVAL)
+
+    @contextmanager
+    def phase(self, results: dict[str, Any]):
+        """Record the lag seen while the block runs."""
+        first = len(self.samples)
+        yield
+        results["loop_lag_ms"] = _distribution(self.samples[first:])
+
+
+class StateWriteCounter:
+    """Count the state writes of media players."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.writes = 0
+        self.last_write = time.monotonic()
+        hass.bus.async_listen("state_changed", self._state_changed)
+
+    def _state_changed(self, event) -> None:
+        if event.data["entity_id"].startswith(f"{MEDIA_PLAYER}."):
+            self.writes += 1
+            self.last_write = time.monotonic()
+
+
+def _distribution(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * 1000, 3),
+        "p50": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p99": round(
+            ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] * 1000, 3
+        ),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def _async_boot(config_dir: str) -> HomeAssistant:
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    hass.auth = await auth_manager_from_config(hass, [{"type": "homeassistant"}], [])
+    if hasattr(loader, "async_setup"):
+        loader.async_setup(hass)
+    await ar.async_load(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    hass.data.setdefault("entity_info", {})
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    if hasattr(hass, "set_state"):
+        hass.set_state(CoreState.running)
+    else:
+        hass.state = CoreState.running
+    await async_setup_component(hass, "homeassistant", {})
+    return hass
+
+
+async def _async_wait_quiet(hass: HomeAssistant, counter: StateWriteCounter) -> None:
+    while time.monotonic() - counter.last_write < QUIET_PERIOD:
+        await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+
+
+async def _async_setup_entries(
+    hass: HomeAssistant, backend: FakeBackend, entries: list
+) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    durations = []
+    start = time.monotonic()
+    for entry in entries:
+        entry_start = time.monotonic()
+        if hass.config_entries.async_get_entry(entry.entry_id):
+            await hass.config_entries.async_setup(entry.entry_id)
+        else:
+            await hass.config_entries.async_add(entry)
+        durations.append(time.monotonic() - entry_start)
+    await hass.async_block_till_done()
+    results["total_s"] = round(time.monotonic() - start, 4)
+    results["per_entry_ms"] = _distribution(durations)
+    results["startup"] = [
+        hass.data[DOMAIN][entry.entry_id].get("startup")
+        for entry in entries
+        if entry.entry_id in hass.data.get(DOMAIN, {})
+    ]
+    return results
+
+
+async def _async_wait_connected(hass: HomeAssistant, entries: list) -> None:
+    for entry in entries:
+        connection = hass.data[DOMAIN][entry.entry_id]["connection"]
+        while not connection.connected:
+            await asyncio.sleep(0.05)
+
+
+async def _async_bench_burst(
+    hass: HomeAssistant, backend: FakeBackend, counter: StateWriteCounter, size: int
+) -> dict[str, Any]:
+    await _async_wait_quiet(hass, counter)
+    writes = counter.writes
+    delivered = backend.broker.delivered
+    start = time.monotonic()
+    await hass.async_add_executor_job(backend.broker.burst, size)
+    await hass.async_add_executor_job(backend.broker.join)
+    counter.last_write = max(counter.last_write, time.monotonic())
+    await _async_wait_quiet(hass, counter)
+    duration = counter.last_write - start
+    writes = counter.writes - writes
+    return {
+        "messages": backend.broker.delivered - delivered,
+        "state_writes": writes,
+        "duration_s": round(duration, 4),
+        "writes_per_s": round(writes / duration, 2) if duration > 0 else None,
+    }
+
+
+async def _async_bench_commands(
+    hass: HomeAssistant, entity_ids: list[str], rounds: int
+) -> dict[str, Any]:
+    latencies = []
+    for number in range(rounds):
+        for entity_id in entity_ids:
+            source = f"Channel {number + 2}"
+            start = time.monotonic()
+            await hass.services.async_call(
+                MEDIA_PLAYER,
+                "select_source",
+                {"entity_id": entity_id, "source": source},
+                blocking=True,
+            )
+            while (state := hass.states.get(entity_id)) is None or state.attributes.get(
+                "source"
+            ) != source:
+                await asyncio.sleep(0.005)
+            latencies.append(time.monotonic() - start)
+    return {"select_source_ms": _distribution(latencies)}
+
+
+async def _async_bench_browse(hass: HomeAssistant, entity_id: str) -> dict[str, Any]:
+    entity = hass.data["entity_components"][MEDIA_PLAYER].get_entity(entity_id)
+    results: dict[str, Any] = {}
+
+    async def timed(name: str, *args) -> Any:
+        start = time.monotonic()
+        media = await entity.async_browse_media(*args)
+        results[name] = round((time.monotonic() - start) * 1000, 3)
+        return media
+
+    root = await timed("root_cold_ms")
+    await timed("root_warm_ms")
+    buckets = [child for child in root.children if child.can_expand]
+    if buckets:
+        bucket = buckets[-1]
+        page = await timed(
+            "bucket_ms", bucket.media_content_type, bucket.media_content_id
+        )
+        shows = [child for child in page.children if child.can_expand]
+        if shows:
+            show = shows[0]
+            await timed("show_cold_ms", show.media_content_type, show.media_content_id)
+            await timed("show_warm_ms", show.media_content_type, show.media_content_id)
+    return results
+
+
+async def async_run(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the benchmark and return its results."""
+    backend = FakeBackend(
+        FakeBackendConfig(
+            accounts=args.accounts,
+            boxes=args.boxes,
+            channels=args.channels,
+            recordings=args.recordings,
+            episodes=args.episodes,
+            latency=args.latency,
+            box_latency=args.box_latency,
+        )
+    )
+    backend.start()
+    tracemalloc.start()
+    config_dir = tempfile.mkdtemp(prefix="lghorizon-bench-")
+    hass = await _async_boot(config_dir)
+    lag = LoopLagMonitor(hass)
+    lag.start()
+    counter = StateWriteCounter(hass)
+    entries = [
+        config_entries.ConfigEntry(
+            version=1,
+            minor_version=1,
+            domain=DOMAIN,
+            title=household.username,
+            data={
+                "country_code": "Ziggo",
+                "username": household.username,
+                "password": "password",
+            },
+            source="user",
+            options={},
+        )
+        for household in backend.households.values()
+    ]
+    results: dict[str, Any] = {"parameters": vars(args)}
+    try:
+        memory_before = tracemalloc.get_traced_memory()[0]
+        phase: dict[str, Any] = {}
+        with lag.phase(phase):
+            phase.update(await _async_setup_entries(hass, backend, entries))
+            await _async_wait_connected(hass, entries)
+        results["cold_setup"] = phase
+        results["memory_after_setup_mb"] = round(
+            (tracemalloc.get_traced_memory()[0] - memory_before) / 2**20, 2
+        )
+
+        entity_ids = sorted(hass.states.async_entity_ids(MEDIA_PLAYER))
+        results["media_players"] = len(entity_ids)
+
+        phase = {}
+        with lag.phase(phase):
+            phase.update(await _async_bench_burst(hass, backend, counter, args.burst))
+        results["mqtt_burst"] = phase
+
+        phase = {}
+        with lag.phase(phase):
+            phase.update(await _async_bench_commands(hass, entity_ids, args.commands))
+        results["commands"] = phase
+
+        phase = {}
+        with lag.phase(phase):
+            phase.update(await _async_bench_browse(hass, entity_ids[0]))
+        results["browse"] = phase
+
+        for entry in entries:
+            await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_block_till_done()
+        phase = {}
+        with lag.phase(phase):
+            phase.update(await _async_setup_entries(hass, backend, entries))
+            await _async_wait_connected(hass, entries)
+        results["warm_setup"] = phase
+
+        results["rest_calls"] = dict(sorted(backend.rest_calls.items()))
+        results["mqtt"] = {
+            "published": backend.broker.published,
+            "delivered": backend.broker.delivered,
+        }
+        current, peak = tracemalloc.get_traced_memory()
+        results["memory"] = {
+            "traced_current_mb": round(current / 2**20, 2),
+            "traced_peak_mb": round(peak / 2**20, 2),
+            "max_rss_mb": round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2
+            ),
+        }
+    finally:
+        lag.stop()
+        await hass.async_stop(force=True)
+        backend.stop()
+        tracemalloc.stop()
+    return results
+
+
+def compare(new: Any, old: Any) -> Any:
+    """Return the relative change of every number in new against old."""
+    if isinstance(new, dict) and isinstance(old, dict):
+        changes = {key: compare(new[key], old[key]) for key in new if key in old}
+        return {key: change for key, change in changes.items() if change is not None}
+    if isinstance(new, (int, float)) and isinstance(old, (int, float)):
+        if isinstance(new, bool) or not old:
+            return None
+        return f"{(new - old) / old:+.1%}"
+    return None
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--boxes", type=int, default=2, help="boxes per account")
+    parser.add_argument("--channels", type=int, default=100)
+    parser.add_argument("--recordings", type=int, default=500)
+    parser.add_argument("--episodes", type=int, default=10, help="episodes per show")
+    parser.add_argument(
+        "--burst", type=int, default=200, help="status messages per box in the burst"
+    )
+    parser.add_argument("--commands", type=int, default=5, help="commands per box")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="REST latency in seconds"
+    )
+    parser.add_argument(
+        "--box-latency", type=float, default=0.02, help="mqtt reply latency in seconds"
+    )
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--compare", help="results of an earlier run to compare with")
+    args = parser.parse_args()
+    output, baseline = args.output, args.compare
+    del args.output, args.compare
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(async_run(args))
+    if baseline:
+        results["compared_to"] = {
+            "file": os.path.basename(baseline),
+            "changes": compare(
+                results, json.loads(Path(baseline).read_text(encoding="utf-8"))
+            ),
+        }
+    text = json.dumps(results, indent=2)
+    if output:
+        Path(output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
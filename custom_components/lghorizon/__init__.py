@@ -1,26 +1,67 @@
 """The lghorizon integration."""
 from __future__ import annotations
 
+import asyncio
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 import voluptuous as vol
 import logging
+import time
 from .const import (
     DOMAIN,
     CONF_COUNTRY_CODE,
     CONF_REFRESH_TOKEN,
     API,
+    ARTWORK_WARMUP,
+    CAPACITY_COORDINATOR,
+    CAPTURE,
+    CHANNELS,
+    CONNECTION,
     COUNTRY_CODES,
-    CONF_IDENTIFIER
+    EPG,
+    HISTORY,
+    CONF_IDENTIFIER,
+    CONF_PREFETCH_ARTWORK,
+    MESSAGE_TAP,
+    METRICS,
+    RECORDINGS_CACHE,
+    SNAPSHOT_STORE,
+    STARTUP,
 )
-
-from lghorizon import LGHorizonApi
+from .capture import LGHorizonCapture
+from .channels import LGHorizonChannelCatalogue
+from .connection import LGHorizonConnection
+from .coordinator import LGHorizonCapacityCoordinator
+from .epg import EPG_REFRESH_INTERVAL, LGHorizonEpgCache
+from .history import LGHorizonViewingHistory
+from .message_tap import LGHorizonMessageTap
+from .metrics import LGHorizonMetrics
+from .pool import (
+    LGHorizonPooledApi,
+    async_get_operator_pool,
+    async_pop_validated_api,
+)
+from .recordings import LGHorizonRecordingsCache
+from .services import async_setup_services
+from .storage import LGHorizonSnapshotStore, boxes_from_snapshot, channels_from_snapshot
+from .thumbnails import async_get_thumbnail_cache
+from .warmup import LGHorizonArtworkWarmup
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = ["media_player", "sensor"]
+# Token refreshes within this many seconds are stored once.
+TOKEN_SAVE_COOLDOWN = 10
+# Seconds a first start may take to connect before the setup is retried.
+FIRST_CONNECT_TIMEOUT = 60
 CONFIG_SCHEMA = vol.Schema(
     {
         DOMAIN: vol.Schema(
@@ -37,8 +78,15 @@ CONFIG_SCHEMA = vol.Schema(
 )
 
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Register the services that act on a whole account."""
+    async_setup_services(hass)
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up lghorizon api from a config entry."""
+    setup_start = time.monotonic()
     telenet_identifier = None
     if CONF_IDENTIFIER in entry.data:
         telenet_identifier = entry.data[CONF_IDENTIFIER]
@@ -47,34 +95,244 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if CONF_REFRESH_TOKEN in entry.data:
        refresh_token = entry.data[CONF_REFRESH_TOKEN]
     
-    api = LGHorizonApi(
+    country_code = COUNTRY_CODES[entry.data[CONF_COUNTRY_CODE]]
+    # An entry created by the config flow continues its authorized session.
+    api = async_pop_validated_api(
+        hass,
+        country_code,
         entry.data[CONF_USERNAME],
         entry.data[CONF_PASSWORD],
-        COUNTRY_CODES[entry.data[CONF_COUNTRY_CODE]],
         telenet_identifier,
-        refresh_token,
     )
-    await hass.async_add_executor_job(api.connect)
+    if api is None:
+        api = LGHorizonPooledApi(
+            async_get_operator_pool(hass, country_code),
+            entry.data[CONF_USERNAME],
+            entry.data[CONF_PASSWORD],
+            country_code,
+            telenet_identifier,
+            refresh_token,
+        )
+
+    @callback
+    def async_save_token() -> None:
+        _async_save_refresh_token(hass, entry, api)
+
+    token_debouncer = Debouncer(
+        hass,
+        _LOGGER,
+        cooldown=TOKEN_SAVE_COOLDOWN,
+        immediate=False,
+        function=async_save_token,
+    )
+
+    @callback
+    def async_flush_token_save() -> None:
+        # A token refreshed within the cooldown is saved now, not dropped.
+        token_debouncer.async_cancel()
+        _async_save_refresh_token(hass, entry, api)
+
+    entry.async_on_unload(async_flush_token_save)
+
+    @callback
+    def async_schedule_token_save() -> None:
+        hass.async_create_task(token_debouncer.async_call())
+
+    # Called from the executor whenever the api refreshed its token.
+    api.set_callback(lambda: hass.loop.call_soon_threadsafe(async_schedule_token_save))
+
+    metrics = LGHorizonMetrics()
+    metrics.instrument(api)
+    message_tap = LGHorizonMessageTap(api)
+    message_tap.add_listener(metrics.handle_message)
+    snapshot_store = LGHorizonSnapshotStore(hass, entry.entry_id)
+    snapshot = await snapshot_store.async_load()
+    if snapshot is None:
+        # First start, nothing to create the entities from yet.
+        connection = LGHorizonConnection(hass, api, message_tap)
+        try:
+            async with asyncio.timeout(FIRST_CONNECT_TIMEOUT):
+                # Home Assistant retries the setup, not the library.
+                await connection.async_connect(retry=False)
+        except Exception as ex:  # pylint: disable=broad-except
+            raise ConfigEntryNotReady(
+                f"Unable to connect {entry.title}: {str(ex) or 'timed out'}"
+            ) from ex
+        channels = LGHorizonChannelCatalogue(hass, api)
+        await snapshot_store.async_save(api, channels.index)
+    else:
+        connection = LGHorizonConnection(
+            hass, api, message_tap, boxes_from_snapshot(snapshot)
+        )
+        channels = LGHorizonChannelCatalogue(
+            hass, api, channels_from_snapshot(snapshot)
+        )
+
+    recordings_cache = LGHorizonRecordingsCache(hass, api)
+    message_tap.add_listener(recordings_cache.handle_message)
+    message_tap.add_listener(channels.handle_message)
+    capacity_coordinator = LGHorizonCapacityCoordinator(hass, api)
+    message_tap.add_listener(capacity_coordinator.handle_message)
+    message_tap.add_listener(connection.handle_message)
+    epg = LGHorizonEpgCache(hass, api, channels)
+    history = LGHorizonViewingHistory(hass, entry.entry_id)
+    await history.async_load()
+    warmup = None
+    if entry.options.get(CONF_PREFETCH_ARTWORK):
+        warmup = LGHorizonArtworkWarmup(
+            hass,
+            channels,
+            recordings_cache,
+            await async_get_thumbnail_cache(hass),
+            entry.title,
+        )
+    entry.async_on_unload(channels.async_add_listener(epg.async_lineup_changed))
+    entry.async_on_unload(
+        async_track_time_interval(hass, epg.async_refresh, EPG_REFRESH_INTERVAL)
+    )
+
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
         API: api,
+        ARTWORK_WARMUP: warmup,
         CONF_USERNAME: entry.data[CONF_USERNAME],
+        CAPACITY_COORDINATOR: capacity_coordinator,
+        CAPTURE: LGHorizonCapture(hass, api, message_tap, channels, entry.title),
+        CHANNELS: channels,
+        CONNECTION: connection,
+        EPG: epg,
+        HISTORY: history,
+        MESSAGE_TAP: message_tap,
+        METRICS: metrics,
+        RECORDINGS_CACHE: recordings_cache,
+        SNAPSHOT_STORE: snapshot_store,
+        STARTUP: {
+            "from_snapshot": snapshot is not None,
+            "connect_seconds": connection.connect_duration,
+        },
     }
+
+    @callback
+    def async_connected() -> None:
+        entry.async_create_background_task(
+            hass, _async_connected(hass, entry), f"{DOMAIN} connected {entry.title}"
+        )
+
+    entry.async_on_unload(connection.async_add_listener(async_connected))
+    if warmup is not None:
+        entry.async_on_unload(connection.async_add_listener(warmup.async_connected))
+        entry.async_on_unload(warmup.async_shutdown)
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
+    connection.async_start_supervision()
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    if CONF_REFRESH_TOKEN in entry.data:
-        _LOGGER.info("New JWT stored: %s", api.refresh_token)
-        new_data = {**entry.data}
-        new_data[CONF_REFRESH_TOKEN] = api.refresh_token
-        hass.config_entries.async_update_entry(entry, data=new_data)
+    setup_duration = time.monotonic() - setup_start
+    hass.data[DOMAIN][entry.entry_id][STARTUP]["setup_seconds"] = setup_duration
+    if connection.connected:
+        _LOGGER.info("Setup of %s took %.2fs", entry.title, setup_duration)
+        entry.async_create_background_task(
+            hass, epg.async_refresh(), f"{DOMAIN} guide {entry.title}"
+        )
+        if warmup is not None:
+            warmup.async_connected()
+    else:
+        _LOGGER.info(
+            "Setup of %s took %.2fs, connecting in the background",
+            entry.title,
+            setup_duration,
+        )
+        entry.async_create_background_task(
+            hass,
+            _async_connect_in_background(hass, entry),
+            f"{DOMAIN} connect {entry.title}",
+        )
 
+    _async_save_refresh_token(hass, entry, api)
     return True
 
 
+@callback
+def _async_save_refresh_token(
+    hass: HomeAssistant, entry: ConfigEntry, api: LGHorizonPooledApi
+) -> None:
+    """Store the refresh token of the api if it changed."""
+    if CONF_REFRESH_TOKEN not in entry.data or not api.refresh_token:
+        return
+    if entry.data[CONF_REFRESH_TOKEN] == api.refresh_token:
+        return
+    _LOGGER.debug("Storing the refreshed token of %s", entry.title)
+    hass.config_entries.async_update_entry(
+        entry, data={**entry.data, CONF_REFRESH_TOKEN: api.refresh_token}
+    )
+
+
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry to apply its new options."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def _async_connect_in_background(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Connect an entry that was set up from its snapshot."""
+    entry_data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if entry_data is None:
+        # Unloaded before the task got to run.
+        return
+    connection: LGHorizonConnection = entry_data[CONNECTION]
+    try:
+        await connection.async_connect()
+    except Exception:  # pylint: disable=broad-except
+        _LOGGER.exception("Unable to connect %s, retrying", entry.title)
+        connection.async_schedule_reconnect()
+
+
+async def _async_connected(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Bring the entry up to date once it connected in the background."""
+    entry_data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if entry_data is None:
+        return
+    connection: LGHorizonConnection = entry_data[CONNECTION]
+    _async_remove_gone_boxes(hass, entry, connection)
+    entry_data[STARTUP]["connect_seconds"] = connection.connect_duration
+    _LOGGER.info("Connected %s in %.2fs", entry.title, connection.connect_duration)
+    channels: LGHorizonChannelCatalogue = entry_data[CHANNELS]
+    channels.async_update()
+    await entry_data[SNAPSHOT_STORE].async_save(connection.api, channels.index)
+    await entry_data[EPG].async_refresh()
+
+
+@callback
+def _async_remove_gone_boxes(
+    hass: HomeAssistant, entry: ConfigEntry, connection: LGHorizonConnection
+) -> None:
+    """Remove the devices and entities of snapshot boxes the account no longer has."""
+    device_registry = dr.async_get(hass)
+    gone = connection.placeholder_boxes.keys() - connection.api.settop_boxes.keys()
+    for box_id in gone:
+        device = device_registry.async_get_device(identifiers={(DOMAIN, box_id)})
+        if device is None:
+            continue
+        _LOGGER.info("Removing box %s, it is no longer part of %s", box_id, entry.title)
+        # Removes the entities of this entry on the device as well.
+        device_registry.async_update_device(
+            device.id, remove_config_entry_id=entry.entry_id
+        )
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+        await entry_data[CAPTURE].async_stop()
+        await entry_data[HISTORY].async_shutdown()
+        entry_data[CONNECTION].async_shutdown()
+        entry_data[RECORDINGS_CACHE].async_shutdown()
+        entry_data[CHANNELS].async_shutdown()
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the snapshot and viewing history of a removed entry."""
+    await LGHorizonSnapshotStore(hass, entry.entry_id).async_remove()
+    await LGHorizonViewingHistory(hass, entry.entry_id).async_remove()
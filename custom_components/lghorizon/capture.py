@@ -0,0 +1,224 @@
+"""Capture of the traffic of a LG Horizon account, for replaying it offline."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime, timedelta
+import functools
+import gzip
+import json
+import logging
+import threading
+import time
+from typing import Any
+
+from homeassistant.components.diagnostics import REDACTED
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util, slugify
+
+from lghorizon import LGHorizonApi
+
+from .channels import LGHorizonChannelCatalogue
+from .message_tap import LGHorizonMessageTap
+from .storage import snapshot_data
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_VERSION = 1
+CAPTURE_DEFAULT_DURATION = timedelta(minutes=10)
+CAPTURE_MAX_DURATION = timedelta(hours=2)
+# Stands in for the household id in topics, urls, messages and responses.
+HOUSEHOLD_PLACEHOLDER = "{householdId}"
+# Keys of REST responses and mqtt messages that hold credentials, such as the
+# token of the /v1/mqtt/token response.
+REDACT_KEYS = frozenset(
+    {"token", "accessToken", "refreshToken", "mqttToken", "validityToken", "password"}
+)
+
+
+def service_path(config: dict[str, Any], url: str) -> str:
+    """Return url relative to the service it belongs to, e.g. linearService/v2/...
+
+    The service urls differ per operator and environment, relative to their
+    service the urls of a capture also match those of a replay.
+    """
+    for name, service in config.items():
+        if not isinstance(service, dict) or "URL" not in service:
+            continue
+        base = service["URL"]
+        if url.startswith(base):
+            return name + url[len(base) :]
+    return url
+
+
+def redact(data: Any) -> Any:
+    """Return data with the values of the credential keys replaced."""
+    if isinstance(data, dict):
+        return {
+            key: REDACTED if key in REDACT_KEYS else redact(value)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [redact(item) for item in data]
+    return data
+
+
+def replace_household(data: Any, household_id: str, replacement: str) -> Any:
+    """Return data with household_id replaced in every key and string."""
+    if isinstance(data, str):
+        return data.replace(household_id, replacement)
+    if isinstance(data, dict):
+        return {
+            replace_household(key, household_id, replacement): replace_household(
+                value, household_id, replacement
+            )
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [replace_household(item, household_id, replacement) for item in data]
+    return data
+
+
+class LGHorizonCapture:
+    """Writes the mqtt messages and REST responses of an account to a file.
+
+    Every line of the gzipped file is a JSON object with the seconds since
+    the start of the capture in "t". The first line holds the boxes and
+    channels, the others an mqtt message or a REST response. Credentials are
+    redacted. Lines are written from the mqtt and executor threads that
+    handle the traffic.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: LGHorizonApi,
+        message_tap: LGHorizonMessageTap,
+        channels: LGHorizonChannelCatalogue,
+        name: str,
+    ) -> None:
+        """Init the capture."""
+        self.hass = hass
+        self.api = api
+        self.message_tap = message_tap
+        self.channels = channels
+        self.name = name
+        self.path: str | None = None
+        self.messages = 0
+        self.responses = 0
+        self._file: gzip.GzipFile | None = None
+        self._lock = threading.Lock()
+        self._start = 0.0
+        self._remove_listener: Callable[[], None] | None = None
+        self._unsub_stop: CALLBACK_TYPE | None = None
+
+    @property
+    def running(self) -> bool:
+        """Return True while capturing."""
+        return self._file is not None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return the state of the capture for diagnostics."""
+        return {
+            "running": self.running,
+            "messages": self.messages,
+            "responses": self.responses,
+        }
+
+    async def async_start(self, duration: timedelta) -> None:
+        """Start capturing, for at most duration."""
+        if self.running:
+            await self.async_stop()
+        stamp = dt_util.now().strftime("%Y%m%d_%H%M%S")
+        path = self.hass.config.path(
+            f"{slugify(f'lghorizon capture {self.name}')}_{stamp}.jsonl.gz"
+        )
+        self._file = await self.hass.async_add_executor_job(
+            functools.partial(gzip.open, path, "wt", encoding="utf-8")
+        )
+        self.path = path
+        self.messages = 0
+        self.responses = 0
+        self._start = time.monotonic()
+        await self.hass.async_add_executor_job(
+            self._write,
+            {
+                "type": "header",
+                "version": CAPTURE_VERSION,
+                "country_code": self.api._country_code,
+                "started": dt_util.utcnow().isoformat(),
+                "snapshot": snapshot_data(self.api, self.channels.index),
+            },
+        )
+        self._remove_listener = self.message_tap.add_listener(self._handle_message)
+        do_api_call = self.api._do_api_call
+
+        def captured_api_call(url: str, *args: Any, **kwargs: Any) -> Any:
+            response = do_api_call(url, *args, **kwargs)
+            self._handle_response(url, response)
+            return response
+
+        self.api._do_api_call = captured_api_call
+        self._unsub_stop = async_call_later(
+            self.hass, duration, self._async_stop_after_duration
+        )
+        _LOGGER.info("Capturing the traffic of %s to %s", self.name, path)
+
+    async def async_stop(self) -> str | None:
+        """Stop capturing and return the path of the file."""
+        if not self.running:
+            return None
+        if self._unsub_stop:
+            self._unsub_stop()
+            self._unsub_stop = None
+        if self._remove_listener:
+            self._remove_listener()
+            self._remove_listener = None
+        del self.api._do_api_call
+        with self._lock:
+            capture_file, self._file = self._file, None
+        await self.hass.async_add_executor_job(capture_file.close)
+        _LOGGER.info(
+            "Captured %s mqtt messages and %s REST responses to %s",
+            self.messages,
+            self.responses,
+            self.path,
+        )
+        return self.path
+
+    @callback
+    def _async_stop_after_duration(self, _now: datetime) -> None:
+        self._unsub_stop = None
+        self.hass.async_create_task(self.async_stop())
+
+    def _handle_message(self, message: Any, topic: str) -> None:
+        """Write an mqtt message, called from mqtt."""
+        household_id = self.api._auth.householdId
+        self.messages += 1
+        self._write(
+            {
+                "type": "mqtt",
+                "topic": topic.replace(household_id, HOUSEHOLD_PLACEHOLDER, 1),
+                "message": redact(
+                    replace_household(message, household_id, HOUSEHOLD_PLACEHOLDER)
+                ),
+            }
+        )
+
+    def _handle_response(self, url: str, response: Any) -> None:
+        """Write a REST response, called from the executor."""
+        path = service_path(self.api._config or {}, url)
+        household_id = getattr(self.api._auth, "householdId", None)
+        if household_id:
+            path = path.replace(household_id, HOUSEHOLD_PLACEHOLDER)
+            response = replace_household(response, household_id, HOUSEHOLD_PLACEHOLDER)
+        self.responses += 1
+        self._write({"type": "rest", "url": path, "response": redact(response)})
+
+    def _write(self, record: dict[str, Any]) -> None:
+        record["t"] = round(time.monotonic() - self._start, 4)
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
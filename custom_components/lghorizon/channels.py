@@ -0,0 +1,160 @@
+"""Channel lineup of a LG Horizon account."""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Mapping
+import copy
+import logging
+from types import MappingProxyType
+from typing import Any, NamedTuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+
+from lghorizon import LGHorizonApi
+
+from .pool import SHARED_LINEUP, LGHorizonPooledApi
+
+_LOGGER = logging.getLogger(__name__)
+
+# Entitlement changes are announced on these topics.
+LINEUP_TOPICS = ("/purchaseService", "/personalizationService")
+LINEUP_REFRESH_COOLDOWN = 10
+
+
+class LGHorizonChannelInfo(NamedTuple):
+    """A channel in the lineup."""
+
+    id: str
+    title: str
+    number: str
+    logo_image: str
+    stream_image: str
+
+
+class LGHorizonChannelIndex:
+    """Immutable lookup tables over a channel lineup."""
+
+    __slots__ = ("channels", "by_id", "by_title", "by_number", "source_list")
+
+    def __init__(self, channels: Iterable[LGHorizonChannelInfo]) -> None:
+        """Build the index."""
+        self.channels: tuple[LGHorizonChannelInfo, ...] = tuple(channels)
+        self.by_id: Mapping[str, LGHorizonChannelInfo] = MappingProxyType(
+            {channel.id: channel for channel in self.channels}
+        )
+        self.by_title: Mapping[str, LGHorizonChannelInfo] = MappingProxyType(
+            {channel.title: channel for channel in self.channels}
+        )
+        self.by_number: Mapping[str, LGHorizonChannelInfo] = MappingProxyType(
+            {channel.number: channel for channel in self.channels}
+        )
+        self.source_list: tuple[str, ...] = tuple(self.by_title)
+
+    @classmethod
+    def from_api(cls, api: LGHorizonApi) -> LGHorizonChannelIndex:
+        """Build the index from the channels the api retrieved."""
+        return cls(
+            LGHorizonChannelInfo(
+                channel.id,
+                channel.title,
+                str(channel.channel_number),
+                channel.logo_image,
+                channel.stream_image,
+            )
+            for channel in api._channels.values()
+        )
+
+    def __eq__(self, other: object) -> bool:
+        """Return True if both indexes describe the same lineup."""
+        if not isinstance(other, LGHorizonChannelIndex):
+            return NotImplemented
+        return self.channels == other.channels
+
+    __hash__ = None
+
+
+class LGHorizonChannelCatalogue:
+    """The current channel index of an account, shared by all its entities."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: LGHorizonApi,
+        index: LGHorizonChannelIndex | None = None,
+    ) -> None:
+        """Init the catalogue, optionally with the lineup of a snapshot."""
+        self.hass = hass
+        self.api = api
+        if index is None:
+            index = LGHorizonChannelIndex.from_api(api)
+        self.index = index
+        self._listeners: list[Callable[[], None]] = []
+        self._refresh_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=LINEUP_REFRESH_COOLDOWN,
+            immediate=False,
+            function=self.async_refresh_lineup,
+        )
+
+    @callback
+    def async_add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener when the lineup changed."""
+        self._listeners.append(listener)
+
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
+
+    @callback
+    def async_update(self) -> bool:
+        """Rebuild the index if the channels of the api changed."""
+        index = LGHorizonChannelIndex.from_api(self.api)
+        if index == self.index:
+            return False
+        _LOGGER.debug("Channel lineup changed, %s channels", len(index.channels))
+        self.index = index
+        for listener in list(self._listeners):
+            listener()
+        return True
+
+    def handle_message(self, message: Any, topic: str) -> None:
+        """Refresh the lineup when entitlements changed, called from mqtt."""
+        if topic.endswith(LINEUP_TOPICS):
+            self.hass.loop.call_soon_threadsafe(self.async_schedule_refresh)
+
+    @callback
+    def async_schedule_refresh(self) -> None:
+        """Refresh the lineup once a burst of changes settled."""
+        self.hass.async_create_task(self._refresh_debouncer.async_call())
+
+    async def async_refresh_lineup(self) -> None:
+        """Fetch the channels again and rebuild the index if they changed."""
+        await self.hass.async_add_executor_job(self._fetch_lineup)
+        self.async_update()
+
+    def _fetch_lineup(self) -> None:
+        """Fetch the channels and swap them in, called from the executor.
+
+        LGHorizonApi._get_channels fills the dict mqtt reads from in place and
+        keeps channels that left the lineup, so it is called on a copy of the
+        api with an empty dict. That dict then replaces the old one at once.
+        """
+        api = self.api
+        if isinstance(api, LGHorizonPooledApi):
+            # The lineup changed, the one shared by the accounts is outdated.
+            api._pool.invalidate(SHARED_LINEUP)
+        fetcher = copy.copy(api)
+        fetcher._channels = {}
+        fetcher._get_channels()
+        api._entitlements = fetcher._entitlements
+        api._channels = fetcher._channels
+        # The boxes look up channels by title in the dict they were given.
+        for box in api.settop_boxes.values():
+            box._channels = fetcher._channels
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancel a pending refresh."""
+        self._refresh_debouncer.async_cancel()
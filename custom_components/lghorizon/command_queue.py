@@ -0,0 +1,121 @@
+"""Ordered, non-blocking command dispatch for LG Horizon boxes."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from lghorizon import LGHorizonBox
+
+_LOGGER = logging.getLogger(__name__)
+
+# Commands sharing a supersede key replace each other while still pending.
+# Only zaps to a given channel or recording supersede each other, relative
+# next and previous steps are all sent, in order.
+SUPERSEDE_ZAP = "zap"
+SUPERSEDE_PLAYBACK = "playback"
+SUPERSEDE_POWER = "power"
+
+
+def send_keys(box: LGHorizonBox, keys: list[str]) -> None:
+    """Publish key presses back to back, without waiting in between."""
+    for key in keys:
+        box.send_key_to_box(key)
+
+
+@dataclass
+class _Command:
+    """A pending box command."""
+
+    func: Callable[..., Any]
+    args: tuple
+    supersede: str | None
+    future: asyncio.Future
+
+
+class LGHorizonCommandQueue:
+    """Run the blocking box api calls in the executor, one at a time."""
+
+    def __init__(self, hass: HomeAssistant, box_id: str) -> None:
+        """Init the queue."""
+        self.hass = hass
+        self.box_id = box_id
+        self._pending: deque[_Command] = deque()
+        self._worker: asyncio.Task | None = None
+        self._running: _Command | None = None
+
+    @callback
+    def async_enqueue(
+        self, func: Callable[..., Any], *args: Any, supersede: str | None = None
+    ) -> asyncio.Future:
+        """Queue a command and return a future that resolves once it ran.
+
+        A pending command with the same supersede key is dropped; its future
+        resolves without the command being sent.
+        """
+        if supersede is not None:
+            for command in [c for c in self._pending if c.supersede == supersede]:
+                _LOGGER.debug(
+                    "Dropping superseded %s command for box %s",
+                    command.func.__name__,
+                    self.box_id,
+                )
+                self._pending.remove(command)
+                command.future.set_result(None)
+
+        future = self.hass.loop.create_future()
+        self._pending.append(_Command(func, args, supersede, future))
+        if self._worker is None or self._worker.done():
+            self._worker = self.hass.async_create_task(self._async_run())
+        return future
+
+    async def async_send(
+        self, func: Callable[..., Any], *args: Any, supersede: str | None = None
+    ) -> None:
+        """Queue a command and wait until it was sent."""
+        await self.async_enqueue(func, *args, supersede=supersede)
+
+    @callback
+    def async_clear(self) -> None:
+        """Drop all pending commands and stop the worker.
+
+        The futures of the dropped commands, and of the command that was being
+        sent, fail with a HomeAssistantError.
+        """
+        commands = list(self._pending)
+        self._pending.clear()
+        if self._running is not None:
+            commands.append(self._running)
+        for command in commands:
+            if not command.future.done():
+                command.future.set_exception(
+                    HomeAssistantError(
+                        f"{command.func.__name__} for box {self.box_id} was dropped"
+                    )
+                )
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        self._worker = None
+        self._running = None
+
+    async def _async_run(self) -> None:
+        """Send the queued commands in order."""
+        while self._pending:
+            command = self._running = self._pending.popleft()
+            try:
+                await self.hass.async_add_executor_job(command.func, *command.args)
+            except Exception as ex:  # pylint: disable=broad-except
+                if not command.future.done():
+                    command.future.set_exception(ex)
+            else:
+                if not command.future.done():
+                    command.future.set_result(None)
+            finally:
+                if self._running is command:
+                    self._running = None
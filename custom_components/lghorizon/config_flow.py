@@ -7,15 +7,19 @@ from typing import Any
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
 import homeassistant.helpers.config_validation as cv
 
-from .const import DOMAIN, CONF_COUNTRY_CODE, CONF_REFRESH_TOKEN, COUNTRY_CODES, CONF_IDENTIFIER
+from .const import DOMAIN, CONF_COUNTRY_CODE, CONF_REFRESH_TOKEN, COUNTRY_CODES, CONF_IDENTIFIER, CONF_PREFETCH_ARTWORK
+from .pool import (
+    LGHorizonPooledApi,
+    async_get_operator_pool,
+    async_store_validated_api,
+)
 from lghorizon import (
-    LGHorizonApi,
     LGHorizonApiUnauthorizedError,
     LGHorizonApiConnectionError,
 )
@@ -47,23 +51,33 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
         if CONF_REFRESH_TOKEN in data:
             refresh_token = data[CONF_REFRESH_TOKEN]
 
-        api = LGHorizonApi(
+        country_code = COUNTRY_CODES[data[CONF_COUNTRY_CODE]]
+        api = LGHorizonPooledApi(
+            async_get_operator_pool(hass, country_code),
             data[CONF_USERNAME],
             data[CONF_PASSWORD],
-            COUNTRY_CODES[data[CONF_COUNTRY_CODE]],
+            country_code,
             telenet_identifier,
             refresh_token,
         )
-        await hass.async_add_executor_job(api.connect)
-        await hass.async_add_executor_job(api.disconnect)
+        # Only authorize, the entry connects the api it is handed.
+        await hass.async_add_executor_job(api.authorize)
+        if not getattr(api._auth, "householdId", None):
+            raise InvalidAuth
     except LGHorizonApiUnauthorizedError:
         raise InvalidAuth
     except LGHorizonApiConnectionError:
         raise CannotConnect
+    except InvalidAuth:
+        raise
     except Exception as ex:
         _LOGGER.error(ex)
         raise CannotConnect
 
+    async_store_validated_api(hass, api)
+    if refresh_token:
+        # The refresh used up the token, the entry continues with the new one.
+        data[CONF_REFRESH_TOKEN] = api.refresh_token
     return {"title": data[CONF_USERNAME]}
 
 
@@ -99,6 +113,43 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Return the options flow."""
+        return OptionsFlowHandler(config_entry)
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of a lghorizon entry."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Init the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_PREFETCH_ARTWORK,
+                        default=self.config_entry.options.get(
+                            CONF_PREFETCH_ARTWORK, False
+                        ),
+                    ): bool,
+                }
+            ),
+        )
+
 
 class CannotConnect(HomeAssistantError):
     """Error to indicate we cannot connect."""
@@ -0,0 +1,200 @@
+"""Connection handling for a LG Horizon account."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from datetime import datetime, timedelta
+import logging
+import random
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from lghorizon import LGHorizonBox, ONLINE_RUNNING, lghorizon_api
+
+from .message_tap import LGHorizonMessageTap
+from .pool import LGHorizonPooledApi
+
+_LOGGER = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = timedelta(seconds=60)
+RECONNECT_BASE_DELAY = 5
+RECONNECT_MAX_DELAY = 600
+# Time the boxes get to report by themselves after a reconnect.
+RESYNC_DELAY = 5
+# Seconds between the reconnect attempts of entries, so an outage does not end
+# in a storm. Only the start is spaced out: the library retries a failing
+# connect by itself for up to 10 minutes, and other entries should not wait
+# for that.
+RECONNECT_STAGGER = 2
+DATA_RECONNECT_LOCK = "lghorizon_reconnect_lock"
+
+
+class LGHorizonConnection:
+    """Connects the api, keeps it connected and tells the entities it did.
+
+    Until the api is connected, boxes restored from the last snapshot stand
+    in for the real ones. A lost mqtt connection is resumed on the same api
+    and boxes, with a new mqtt client.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: LGHorizonPooledApi,
+        message_tap: LGHorizonMessageTap,
+        placeholder_boxes: dict[str, LGHorizonBox] | None = None,
+    ) -> None:
+        """Init the connection."""
+        self.hass = hass
+        self.api = api
+        self.message_tap = message_tap
+        self.placeholder_boxes = placeholder_boxes or {}
+        self.connected = False
+        self.connect_duration: float | None = None
+        self.reconnects = 0
+        self._listeners: list[Callable[[], None]] = []
+        self._reconnect_task: asyncio.Task | None = None
+        self._stop_health_check: Callable[[], None] | None = None
+        # Boxes that reported their status since the last reconnect.
+        self._reported: set[str] = set()
+
+    @property
+    def boxes(self) -> dict[str, LGHorizonBox]:
+        """Return the boxes of the account."""
+        if self.connected:
+            return self.api.settop_boxes
+        return self.placeholder_boxes
+
+    @property
+    def mqtt_connected(self) -> bool:
+        """Return True if the mqtt client of the api is connected."""
+        client = self.api._mqttClient
+        return client is not None and client._mqtt_client.is_connected()
+
+    @callback
+    def async_add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener when the api connected."""
+        self._listeners.append(listener)
+
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
+
+    async def async_connect(self, retry: bool = True) -> None:
+        """Connect the api, without the retries of the library if retry is False."""
+        start = time.monotonic()
+        await self.hass.async_add_executor_job(
+            self.api.connect if retry else self.api.connect_once
+        )
+        self.message_tap.install()
+        self.connect_duration = time.monotonic() - start
+        self.connected = True
+        for listener in list(self._listeners):
+            listener()
+
+    @callback
+    def async_start_supervision(self) -> None:
+        """Check the mqtt connection regularly and reconnect when it dropped."""
+        self._stop_health_check = async_track_time_interval(
+            self.hass, self._async_check_health, HEALTH_CHECK_INTERVAL
+        )
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop supervising the connection."""
+        if self._stop_health_check is not None:
+            self._stop_health_check()
+            self._stop_health_check = None
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+
+    @callback
+    def _async_check_health(self, _now: datetime) -> None:
+        if self.connected and not self.mqtt_connected:
+            _LOGGER.warning("Lost the connection to the LG Horizon backend")
+            self.async_schedule_reconnect()
+
+    @callback
+    def async_schedule_reconnect(self) -> None:
+        """Reconnect in the background, unless that is already happening."""
+        if self._reconnect_task is None:
+            self._reconnect_task = self.hass.async_create_background_task(
+                self._async_reconnect(), f"lghorizon reconnect {self.api.username}"
+            )
+
+    async def _async_reconnect(self) -> None:
+        """Reconnect with jittered exponential backoff."""
+        lock = self.hass.data.setdefault(DATA_RECONNECT_LOCK, asyncio.Lock())
+        attempt = 0
+        try:
+            while True:
+                delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2**attempt)
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+                if self.connected and self.mqtt_connected:
+                    # The mqtt client reconnected by itself.
+                    return
+                async with lock:
+                    await asyncio.sleep(RECONNECT_STAGGER)
+                try:
+                    if self.connected:
+                        await self.hass.async_add_executor_job(self._resume)
+                    else:
+                        await self.async_connect()
+                except Exception as ex:  # pylint: disable=broad-except
+                    attempt += 1
+                    _LOGGER.warning("Reconnect attempt %s failed: %s", attempt, ex)
+                    continue
+                self.reconnects += 1
+                _LOGGER.info("Reconnected to the LG Horizon backend")
+                await asyncio.sleep(RESYNC_DELAY)
+                await self.hass.async_add_executor_job(self._resync)
+                return
+        finally:
+            self._reconnect_task = None
+
+    def _resume(self) -> None:
+        """Replace the mqtt client, keeping the api and its boxes."""
+        api = self.api
+        old_client = api._mqttClient
+        try:
+            old_client._mqtt_client.loop_stop()
+            old_client.disconnect()
+        except Exception:  # pylint: disable=broad-except
+            pass
+        self._reported.clear()
+        # The mqtt token may have expired with the access token.
+        api._authorize()
+        api._obtain_mqtt_token()
+        client = lghorizon_api.LGHorizonMqttClient(
+            api._auth,
+            api._config["mqttBroker"]["URL"],
+            api._on_mqtt_connected,
+            api._on_mqtt_message,
+        )
+        api._mqttClient = client
+        for box in api.settop_boxes.values():
+            box._mqtt_client = client
+        self.message_tap.install()
+        client.connect()
+
+    def _resync(self) -> None:
+        """Ask the running boxes that stayed silent since the reconnect for their status.
+
+        Boxes that changed power state while disconnected already reported,
+        the api asks those itself.
+        """
+        for box_id, box in self.api.settop_boxes.items():
+            if box.state == ONLINE_RUNNING and box_id not in self._reported:
+                box._request_settop_box_state()
+
+    def handle_message(self, message: Any, topic: str) -> None:
+        """Note which boxes reported their status, called from mqtt."""
+        if isinstance(message, dict) and "status" in message:
+            source = message.get("source")
+            if isinstance(source, str):
+                self._reported.add(source)
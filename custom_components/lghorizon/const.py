@@ -2,15 +2,43 @@
 
 DOMAIN = "lghorizon"
 API = "lghorizon_api"
+ARTWORK_WARMUP = "artwork_warmup"
+CAPACITY_COORDINATOR = "capacity_coordinator"
+CAPTURE = "capture"
+CHANNELS = "channels"
+CONNECTION = "connection"
+EPG = "epg"
+HISTORY = "history"
+MESSAGE_TAP = "message_tap"
+METRICS = "metrics"
+RECORDINGS_CACHE = "recordings_cache"
+SNAPSHOT_STORE = "snapshot_store"
+STARTUP = "startup"
 CONF_COUNTRY_CODE = "country_code"
+CONF_CONFIG_ENTRY_ID = "config_entry_id"
 CONF_REFRESH_TOKEN = "refresh_token"
 CONF_REMOTE_KEY = "remote_key"
+CONF_KEYS = "keys"
+CONF_PLAY_MODE = "play_mode"
+CONF_CHANNEL = "channel"
+CONF_WAIT_FOR = "wait_for"
 CONF_IDENTIFIER = "identifier"
+CONF_DURATION = "duration"
+CONF_QUERY = "query"
+CONF_LIMIT = "limit"
+CONF_PREFETCH_ARTWORK = "prefetch_artwork"
 
 RECORD = "record"
 REWIND = "rewind"
 FAST_FORWARD = "fast_forward"
 REMOTE_KEY_PRESS = "remote_key_press"
+REMOTE_KEY_SEQUENCE = "remote_key_sequence"
+START_CAPTURE = "start_capture"
+STOP_CAPTURE = "stop_capture"
+SEARCH_RECORDINGS = "search_recordings"
+START_PROFILING = "start_profiling"
+STOP_PROFILING = "stop_profiling"
+GET_VIEWING_HISTORY = "get_viewing_history"
 
 COUNTRY_CODES = {
     "Ziggo": "nl",
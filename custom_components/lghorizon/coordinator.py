@@ -0,0 +1,49 @@
+"""Recording capacity coordinator for LG Horizon."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from lghorizon import LGHorizonApi
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPACITY_POLL_INTERVAL = timedelta(hours=1)
+
+
+class LGHorizonCapacityCoordinator(DataUpdateCoordinator[int | None]):
+    """Recording capacity of an account, as a percentage in use.
+
+    The boxes push their capacity over mqtt, but in a unit of their own, so
+    a push only triggers a debounced poll. The poll timer restarts after
+    every poll, so the backend is only asked on a schedule when nothing was
+    pushed for a whole interval.
+    """
+
+    def __init__(self, hass: HomeAssistant, api: LGHorizonApi) -> None:
+        """Init the coordinator."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} recording capacity",
+            update_interval=CAPACITY_POLL_INTERVAL,
+        )
+        self.api = api
+
+    def handle_message(self, message: Any, topic: str) -> None:
+        """Poll after a capacity push, called from mqtt."""
+        if isinstance(message, dict) and "CPE.capacity" in message:
+            asyncio.run_coroutine_threadsafe(
+                self.async_request_refresh(), self.hass.loop
+            )
+
+    async def _async_update_data(self) -> int | None:
+        """Poll the capacity."""
+        return await self.hass.async_add_executor_job(self.api.get_recording_capacity)
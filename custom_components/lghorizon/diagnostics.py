@@ -0,0 +1,48 @@
+"""Diagnostics support for LG Horizon."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    ARTWORK_WARMUP,
+    CAPTURE,
+    CONF_COUNTRY_CODE,
+    CONNECTION,
+    COUNTRY_CODES,
+    DOMAIN,
+    EPG,
+    METRICS,
+    RECORDINGS_CACHE,
+    STARTUP,
+)
+from .pool import async_get_operator_pool
+from .thumbnails import async_get_thumbnail_cache
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    connection = entry_data[CONNECTION]
+    warmup = entry_data[ARTWORK_WARMUP]
+    return {
+        "startup": entry_data[STARTUP],
+        "connection": {
+            "connected": connection.connected,
+            "mqtt_connected": connection.mqtt_connected,
+            "reconnects": connection.reconnects,
+        },
+        "recordings_cache": entry_data[RECORDINGS_CACHE].stats,
+        "metrics": entry_data[METRICS].as_dict(),
+        "epg": entry_data[EPG].stats,
+        "capture": entry_data[CAPTURE].stats,
+        "thumbnails": (await async_get_thumbnail_cache(hass)).stats,
+        "artwork_warmup": warmup.stats if warmup is not None else None,
+        "operator_pool": async_get_operator_pool(
+            hass, COUNTRY_CODES[entry.data[CONF_COUNTRY_CODE]]
+        ).stats,
+    }
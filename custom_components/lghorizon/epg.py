@@ -0,0 +1,251 @@
+"""Programme guide of a LG Horizon account."""
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Callable, Iterable
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+from typing import Any, NamedTuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from lghorizon import LGHorizonApi
+
+from .channels import LGHorizonChannelCatalogue
+
+_LOGGER = logging.getLogger(__name__)
+
+# The guide is served in segments of this many hours, aligned to UTC.
+SEGMENT_HOURS = 6
+SEGMENT_SECONDS = SEGMENT_HOURS * 3600
+# How far ahead the guide is kept.
+PREFETCH_HOURS = 12
+EPG_REFRESH_INTERVAL = timedelta(minutes=30)
+EPG_SERVICE = "epgService"
+
+
+class LGHorizonEpgEvent(NamedTuple):
+    """A programme on a channel, times in seconds since the epoch."""
+
+    id: str
+    title: str
+    start: int
+    end: int
+
+    @property
+    def start_time(self) -> datetime:
+        """Return the start in the time zone of Home Assistant."""
+        return dt_util.as_local(dt_util.utc_from_timestamp(self.start))
+
+
+class LGHorizonEpgIndex:
+    """Programmes per channel, ordered by start time for bisecting."""
+
+    __slots__ = ("_starts", "_events")
+
+    def __init__(self, events: dict[str, Iterable[LGHorizonEpgEvent]]) -> None:
+        """Build the index."""
+        self._starts: dict[str, list[int]] = {}
+        self._events: dict[str, tuple[LGHorizonEpgEvent, ...]] = {}
+        for channel_id, channel_events in events.items():
+            ordered = tuple(sorted(set(channel_events), key=lambda event: event.start))
+            self._events[channel_id] = ordered
+            self._starts[channel_id] = [event.start for event in ordered]
+
+    def __len__(self) -> int:
+        """Return the number of programmes."""
+        return sum(len(events) for events in self._events.values())
+
+    def on_at(self, channel_id: str, when: float) -> LGHorizonEpgEvent | None:
+        """Return the programme on a channel at a time."""
+        starts = self._starts.get(channel_id)
+        if not starts:
+            return None
+        position = bisect_right(starts, when) - 1
+        if position < 0:
+            return None
+        event = self._events[channel_id][position]
+        return event if event.end > when else None
+
+    def next_after(self, channel_id: str, when: float) -> LGHorizonEpgEvent | None:
+        """Return the first programme on a channel that starts after a time."""
+        starts = self._starts.get(channel_id)
+        if not starts:
+            return None
+        position = bisect_right(starts, when)
+        if position == len(starts):
+            return None
+        return self._events[channel_id][position]
+
+    def between(
+        self, channel_id: str, start: float, end: float
+    ) -> tuple[LGHorizonEpgEvent, ...]:
+        """Return the programmes on a channel that overlap a period."""
+        starts = self._starts.get(channel_id)
+        if not starts:
+            return ()
+        first = max(bisect_right(starts, start) - 1, 0)
+        last = bisect_right(starts, end)
+        return tuple(
+            event for event in self._events[channel_id][first:last] if event.end > start
+        )
+
+
+class LGHorizonEpgCache:
+    """The guide of the channel lineup, from now to a few hours ahead.
+
+    Segments are fetched once; a refresh drops the segments that ended and
+    only fetches the ones that moved into the window. A lineup change bumps
+    the generation, segments fetched for an older generation are dropped and
+    the running refresh starts over.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: LGHorizonApi,
+        channels: LGHorizonChannelCatalogue,
+    ) -> None:
+        """Init the cache."""
+        self.hass = hass
+        self.api = api
+        self.channels = channels
+        self.index = LGHorizonEpgIndex({})
+        self._segments: dict[int, dict[str, list[LGHorizonEpgEvent]]] = {}
+        self._listeners: list[Callable[[], None]] = []
+        self._refreshing = False
+        self._refresh_again = False
+        self._generation = 0
+        self.segment_fetches = 0
+
+    @property
+    def available(self) -> bool:
+        """Return True if the operator serves a guide."""
+        config = self.api._config or {}
+        return EPG_SERVICE in config
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the counters for diagnostics."""
+        return {
+            "segments": len(self._segments),
+            "events": len(self.index),
+            "segment_fetches": self.segment_fetches,
+        }
+
+    @callback
+    def async_add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener when the guide changed."""
+        self._listeners.append(listener)
+
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
+
+    def on_now(self, channel_id: str) -> LGHorizonEpgEvent | None:
+        """Return the programme on a channel now."""
+        return self.index.on_at(channel_id, time.time())
+
+    def next_up(self, channel_id: str) -> LGHorizonEpgEvent | None:
+        """Return the next programme on a channel."""
+        return self.index.next_after(channel_id, time.time())
+
+    def upcoming(self, channel_id: str) -> tuple[LGHorizonEpgEvent, ...]:
+        """Return the programmes on a channel from now to the end of the window."""
+        now = time.time()
+        return self.index.between(channel_id, now, now + PREFETCH_HOURS * 3600)
+
+    @callback
+    def async_lineup_changed(self) -> None:
+        """Fetch the guide again for a changed lineup."""
+        self._generation += 1
+        self._segments.clear()
+        self.hass.async_create_task(self.async_refresh())
+
+    async def async_refresh(self, _now: datetime | None = None) -> None:
+        """Move the window, fetching only the segments that are missing."""
+        if not self.available:
+            return
+        if self._refreshing:
+            self._refresh_again = True
+            return
+        self._refreshing = True
+        try:
+            self._refresh_again = True
+            while self._refresh_again:
+                self._refresh_again = False
+                await self._async_refresh()
+        finally:
+            self._refreshing = False
+
+    async def _async_refresh(self) -> None:
+        generation = self._generation
+        now = int(time.time())
+        first = now - now % SEGMENT_SECONDS
+        wanted = range(first, now + PREFETCH_HOURS * 3600, SEGMENT_SECONDS)
+        changed = False
+        for segment in [segment for segment in self._segments if segment < first]:
+            del self._segments[segment]
+            changed = True
+        for segment in wanted:
+            if segment in self._segments:
+                continue
+            try:
+                events = await self.hass.async_add_executor_job(
+                    self._fetch_segment, segment
+                )
+            except Exception as ex:  # pylint: disable=broad-except
+                _LOGGER.debug("Unable to fetch guide segment %s: %s", segment, ex)
+                continue
+            if generation != self._generation:
+                # Fetched for the old lineup, async_refresh starts over.
+                self._refresh_again = True
+                return
+            self._segments[segment] = events
+            self.segment_fetches += 1
+            changed = True
+        if not changed:
+            return
+        merged: dict[str, list[LGHorizonEpgEvent]] = {}
+        for events in self._segments.values():
+            for channel_id, channel_events in events.items():
+                merged.setdefault(channel_id, []).extend(channel_events)
+        self.index = LGHorizonEpgIndex(merged)
+        for listener in list(self._listeners):
+            listener()
+
+    def _fetch_segment(self, segment: int) -> dict[str, list[LGHorizonEpgEvent]]:
+        """Fetch a segment, keeping the channels of the lineup."""
+        stamp = datetime.fromtimestamp(segment, timezone.utc).strftime("%Y%m%d%H%M%S")
+        url = (
+            f"{self.api._config[EPG_SERVICE]['URL']}/{self.api._country_code[0:2]}/"
+            f"{self.api._country_settings['language']}/events/segments/{stamp}"
+        )
+        result = self.api._do_api_call(url)
+        lineup = self.channels.index.by_id
+        events: dict[str, list[LGHorizonEpgEvent]] = {}
+        for entry in result.get("entries", []):
+            channel_id = entry.get("channelId")
+            if channel_id not in lineup:
+                continue
+            events[channel_id] = [
+                event
+                for event in map(_parse_event, entry.get("events", []))
+                if event is not None
+            ]
+        return events
+
+
+def _parse_event(event: dict[str, Any]) -> LGHorizonEpgEvent | None:
+    try:
+        return LGHorizonEpgEvent(
+            event["id"],
+            event.get("title", ""),
+            int(event["startTime"]),
+            int(event["endTime"]),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
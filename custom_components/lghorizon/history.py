@@ -0,0 +1,129 @@
+"""What the boxes of a LG Horizon account watched."""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable
+from itertools import islice
+import time
+from typing import Any, NamedTuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+# Programmes kept per box, the oldest are dropped first.
+HISTORY_SIZE = 500
+# Seconds between saves, programmes that start in between are saved together.
+HISTORY_SAVE_DELAY = 300
+
+
+class LGHorizonHistoryRecord(NamedTuple):
+    """A programme a box started to show."""
+
+    timestamp: float
+    channel: str | None
+    title: str | None
+    source_type: str | None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the record as returned by the service."""
+        return {
+            "time": dt_util.utc_from_timestamp(self.timestamp).isoformat(),
+            "channel": self.channel,
+            "title": self.title,
+            "play_mode": self.source_type,
+        }
+
+
+class LGHorizonViewingHistory:
+    """A ring buffer of the programmes each box showed, saved in batches.
+
+    A record is only added when the channel, title or play mode of a box
+    changes, so position and capacity updates do not add to it. It is kept
+    apart from the recorder, which would store every state of the player.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Init the history."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.history"
+        )
+        self._boxes: dict[str, deque[LGHorizonHistoryRecord]] = {}
+        self._listeners: dict[str, list[Callable[[], None]]] = {}
+        self._dirty = False
+
+    async def async_load(self) -> None:
+        """Load the saved history."""
+        data = await self._store.async_load()
+        if data is None:
+            return
+        for box_id, records in data["boxes"].items():
+            self._boxes[box_id] = deque(
+                (LGHorizonHistoryRecord(*record) for record in records),
+                maxlen=HISTORY_SIZE,
+            )
+
+    @callback
+    def async_add_listener(
+        self, box_id: str, listener: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Call listener when a box started another programme."""
+        listeners = self._listeners.setdefault(box_id, [])
+        listeners.append(listener)
+
+        def remove_listener() -> None:
+            listeners.remove(listener)
+
+        return remove_listener
+
+    @callback
+    def async_record(
+        self,
+        box_id: str,
+        channel: str | None,
+        title: str | None,
+        source_type: str | None,
+    ) -> None:
+        """Add a record if the box shows something else than its last one."""
+        records = self._boxes.setdefault(box_id, deque(maxlen=HISTORY_SIZE))
+        if records and records[-1][1:] == (channel, title, source_type):
+            return
+        records.append(LGHorizonHistoryRecord(time.time(), channel, title, source_type))
+        self._dirty = True
+        self._store.async_delay_save(self._data_to_save, HISTORY_SAVE_DELAY)
+        for listener in list(self._listeners.get(box_id, ())):
+            listener()
+
+    @callback
+    def last(self, box_id: str) -> LGHorizonHistoryRecord | None:
+        """Return the last record of a box."""
+        records = self._boxes.get(box_id)
+        return records[-1] if records else None
+
+    @callback
+    def records(
+        self, box_id: str, limit: int | None = None
+    ) -> list[LGHorizonHistoryRecord]:
+        """Return the records of a box, newest first."""
+        return list(islice(reversed(self._boxes.get(box_id, ())), limit))
+
+    async def async_shutdown(self) -> None:
+        """Save what was recorded since the last save."""
+        if self._dirty:
+            await self._store.async_save(self._data_to_save())
+
+    async def async_remove(self) -> None:
+        """Remove the saved history."""
+        await self._store.async_remove()
+
+    def _data_to_save(self) -> dict[str, Any]:
+        self._dirty = False
+        return {
+            "boxes": {
+                box_id: [list(record) for record in records]
+                for box_id, records in self._boxes.items()
+            }
+        }
@@ -1,39 +1,78 @@
 """Support for interface with a ArrisDCX960 Settopbox."""
 
+import asyncio
+import functools
 import logging
-import random
 import datetime as dt
-import time
 import voluptuous as vol
-from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.const import (
+    CONF_DELAY,
+    CONF_STATE,
+    CONF_TIMEOUT,
+)
 from homeassistant.helpers import config_validation as cv, entity_platform
 from homeassistant.components.media_player import (
     MediaPlayerEntity,
     BrowseMedia,
-    MediaPlayerEntityFeature,
+    MediaPlayerState,
     MediaType,
     MediaClass,
-    MediaPlayerState,
 )
+from homeassistant.components.media_player.errors import BrowseError
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.util import dt as dt_util
+from homeassistant.core import HomeAssistant, SupportsResponse, callback
+from homeassistant.helpers.event import async_call_later
 from .const import (
     API,
-    CONF_REFRESH_TOKEN,
+    CAPACITY_COORDINATOR,
+    CHANNELS,
+    CONF_CHANNEL,
+    CONF_LIMIT,
+    CONF_QUERY,
+    CONF_KEYS,
+    CONF_PLAY_MODE,
+    CONF_WAIT_FOR,
+    CONNECTION,
     DOMAIN,
+    EPG,
+    GET_VIEWING_HISTORY,
+    HISTORY,
+    METRICS,
     RECORD,
     REWIND,
     FAST_FORWARD,
     CONF_REMOTE_KEY,
+    RECORDINGS_CACHE,
     REMOTE_KEY_PRESS,
+    REMOTE_KEY_SEQUENCE,
+    SEARCH_RECORDINGS,
+)
+from .channels import LGHorizonChannelCatalogue
+from .connection import LGHorizonConnection
+from .coordinator import LGHorizonCapacityCoordinator
+from .epg import LGHorizonEpgCache
+from .history import HISTORY_SIZE, LGHorizonViewingHistory
+from .metrics import LGHorizonMetrics
+from .position import LGHorizonPositionTracker
+from .command_queue import (
+    LGHorizonCommandQueue,
+    SUPERSEDE_PLAYBACK,
+    SUPERSEDE_POWER,
+    SUPERSEDE_ZAP,
+    send_keys,
+)
+
+from .recordings import SEARCH_LIMIT, LGHorizonRecordingsCache
+from .snapshot import LGHorizonBoxSnapshot, player_state
+from .thumbnails import (
+    LGHorizonThumbnailCache,
+    async_get_thumbnail_cache,
 )
 
 from lghorizon import (
     LGHorizonBox,
-    ONLINE_RUNNING,
-    ONLINE_STANDBY,
     LGHorizonApi,
     LGHorizonRecordingShow,
     LGHorizonRecordingSingle,
@@ -43,31 +82,131 @@ from lghorizon import (
 
 _LOGGER = logging.getLogger(__name__)
 
+# Window in which a burst of box updates is collapsed into one state write.
+STATE_WRITE_DELAY = 0.25
+# How long to wait for the box to confirm it left an app.
+APP_EXIT_TIMEOUT = 5
+
+# Recordings and episodes are browsed in pages of this size.
+BROWSE_PAGE_SIZE = 100
+BROWSE_RECENT = "recent"
+BROWSE_BUCKET = "bucket"
+BROWSE_EPG = "epg"
+BROWSE_EPG_CHANNEL = "epg_channel"
+BROWSE_SEARCH = "search"
+BROWSE_IMAGE = "image"
+PAGE_SEPARATOR = "|page="
+
+# Default time to wait for the box to reach the state a key step waits for.
+KEY_WAIT_TIMEOUT = 5
+
+WAIT_FOR_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_STATE): cv.string,
+        vol.Optional(CONF_PLAY_MODE): cv.string,
+        vol.Optional(CONF_CHANNEL): cv.string,
+        vol.Optional(CONF_TIMEOUT, default=KEY_WAIT_TIMEOUT): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=60)
+        ),
+    }
+)
+KEY_STEP_SCHEMA = vol.Any(
+    cv.string,
+    vol.Schema(
+        {
+            vol.Required(CONF_REMOTE_KEY): cv.string,
+            vol.Optional(CONF_DELAY): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=60)
+            ),
+            vol.Optional(CONF_WAIT_FOR): WAIT_FOR_SCHEMA,
+        }
+    ),
+)
+
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Setup platform"""
-    players = []
+    players = {}
     api = hass.data[DOMAIN][entry.entry_id][API]
-    for box in api.settop_boxes.values():
-        players.append(LGHorizonMediaPlayer(box, api, hass, entry))
-    async_add_entities(players, True)
+    connection = hass.data[DOMAIN][entry.entry_id][CONNECTION]
+    channels = hass.data[DOMAIN][entry.entry_id][CHANNELS]
+    epg = hass.data[DOMAIN][entry.entry_id][EPG]
+    capacity = hass.data[DOMAIN][entry.entry_id][CAPACITY_COORDINATOR]
+    recordings_cache = hass.data[DOMAIN][entry.entry_id][RECORDINGS_CACHE]
+    metrics = hass.data[DOMAIN][entry.entry_id][METRICS]
+    history = hass.data[DOMAIN][entry.entry_id][HISTORY]
+    thumbnails = await async_get_thumbnail_cache(hass)
+
+    def create_player(box):
+        players[box.deviceId] = LGHorizonMediaPlayer(
+            box,
+            api,
+            connection,
+            channels,
+            epg,
+            capacity,
+            recordings_cache,
+            thumbnails,
+            metrics,
+            history,
+            hass,
+            entry,
+        )
+        return players[box.deviceId]
+
+    async_add_entities([create_player(box) for box in connection.boxes.values()])
+
+    @callback
+    def async_connected():
+        """Bind the connected boxes, and add boxes the snapshot did not know."""
+        new_players = []
+        for box in api.settop_boxes.values():
+            if box.deviceId in players:
+                players[box.deviceId].async_attach_box(box)
+            else:
+                new_players.append(create_player(box))
+        if new_players:
+            async_add_entities(new_players)
+
+    entry.async_on_unload(connection.async_add_listener(async_connected))
 
     platform = entity_platform.async_get_current_platform()
     default_service_schema = cv.make_entity_service_schema({})
 
     async def handle_default_services(entity, call):
         _LOGGER.debug(f"Service {call.service} was called for box {entity.unique_id}")
+        if call.service == GET_VIEWING_HISTORY:
+            return {
+                "history": [
+                    record.as_dict()
+                    for record in history.records(
+                        entity.unique_id, call.data[CONF_LIMIT]
+                    )
+                ]
+            }
+        if call.service == SEARCH_RECORDINGS:
+            return await entity.async_search_recordings(
+                call.data[CONF_QUERY], call.data[CONF_LIMIT]
+            )
+        box = api.settop_boxes.get(entity.unique_id)
+        if box is None:
+            raise HomeAssistantError(f"Box {entity.unique_id} is not connected")
         if call.service == REWIND:
-            api.settop_boxes[entity.unique_id].rewind()
+            await entity.async_send_command(box.rewind)
         elif call.service == FAST_FORWARD:
-            api.settop_boxes[entity.unique_id].fast_forward()
+            await entity.async_send_command(box.fast_forward)
         elif call.service == RECORD:
-            api.settop_boxes[entity.unique_id].record()
+            await entity.async_send_command(box.record)
+            recordings_cache.async_invalidate()
         elif call.service == REMOTE_KEY_PRESS:
             key = call.data[CONF_REMOTE_KEY]
-            api.settop_boxes[entity.unique_id].send_key_to_box(key)
+            await entity.async_send_command(box.send_key_to_box, key)
+        elif call.service == REMOTE_KEY_SEQUENCE:
+            await entity.async_send_key_sequence(
+                call.data[CONF_KEYS], call.data[CONF_DELAY]
+            )
 
     platform.async_register_entity_service(
         RECORD,
@@ -92,6 +231,48 @@ async def async_setup_entry(
         key_schema,
         handle_default_services,
     )
+    key_sequence_schema = cv.make_entity_service_schema(
+        {
+            vol.Required(CONF_KEYS): vol.All(
+                cv.ensure_list, vol.Length(min=1), [KEY_STEP_SCHEMA]
+            ),
+            vol.Optional(CONF_DELAY, default=0): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=60)
+            ),
+        }
+    )
+    platform.async_register_entity_service(
+        REMOTE_KEY_SEQUENCE,
+        key_sequence_schema,
+        handle_default_services,
+    )
+    search_schema = cv.make_entity_service_schema(
+        {
+            vol.Required(CONF_QUERY): cv.string,
+            vol.Optional(CONF_LIMIT, default=SEARCH_LIMIT): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=BROWSE_PAGE_SIZE)
+            ),
+        }
+    )
+    platform.async_register_entity_service(
+        SEARCH_RECORDINGS,
+        search_schema,
+        handle_default_services,
+        supports_response=SupportsResponse.ONLY,
+    )
+    history_schema = cv.make_entity_service_schema(
+        {
+            vol.Optional(CONF_LIMIT, default=HISTORY_SIZE): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=HISTORY_SIZE)
+            ),
+        }
+    )
+    platform.async_register_entity_service(
+        GET_VIEWING_HISTORY,
+        history_schema,
+        handle_default_services,
+        supports_response=SupportsResponse.ONLY,
+    )
 
 
 class LGHorizonMediaPlayer(MediaPlayerEntity):
@@ -104,7 +285,8 @@ class LGHorizonMediaPlayer(MediaPlayerEntity):
 
     @property
     def media_image_remotely_accessible(self):
-        return True
+        # Artwork is served from the local thumbnail cache.
+        return False
 
     @property
     def device_class(self):
@@ -123,47 +305,208 @@ class LGHorizonMediaPlayer(MediaPlayerEntity):
             "model": self._box.model or "unknown",
         }
 
-    def __init__(self, box: LGHorizonBox, api: LGHorizonApi, hass: HomeAssistant, entry: ConfigEntry):
+    def __init__(
+        self,
+        box: LGHorizonBox,
+        api: LGHorizonApi,
+        connection: LGHorizonConnection,
+        channels: LGHorizonChannelCatalogue,
+        epg: LGHorizonEpgCache,
+        capacity: LGHorizonCapacityCoordinator,
+        recordings_cache: LGHorizonRecordingsCache,
+        thumbnails: LGHorizonThumbnailCache,
+        metrics: LGHorizonMetrics,
+        history: LGHorizonViewingHistory,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+    ):
         """Init the media player."""
         self._box = box
         self.api = api
+        self._connection = connection
+        self._channels = channels
+        self._epg = epg
+        self._capacity = capacity
+        self._recordings = recordings_cache
+        self._thumbnails = thumbnails
+        self._history = history
         self.hass = hass
         self.entry = entry
         self.box_id = box.deviceId
         self.box_name = box.deviceFriendlyName
-        self._create_channel_map()
-
-    def _create_channel_map(self):
-        self._channels = {}
-        for channel in self.api._channels.values():
-            self._channels[channel.title] = channel.title
+        self._write_unsub = None
+        self._last_search = None
+        self._waiters = []
+        self._commands = LGHorizonCommandQueue(hass, self.box_id)
+        self._metrics = metrics.box(self.box_id)
+        self._position = LGHorizonPositionTracker()
+        # Home Assistant reads the features before the entity is added.
+        self._snapshot = self._take_snapshot()
 
     async def async_added_to_hass(self):
         """Use lifecycle hooks."""
 
-        def callback(box_id):
-            self.schedule_update_ha_state(True)
+        self._update_position()
+        self._snapshot = self._take_snapshot()
+        self._box.set_callback(self._box_callback)
+        self.async_on_remove(
+            self._channels.async_add_listener(self.async_write_ha_state)
+        )
+        self.async_on_remove(self._epg.async_add_listener(self._async_write_snapshot))
+        self.async_on_remove(self._capacity.async_add_listener(self._async_box_updated))
+
+    def _box_callback(self, box_id):
+        """Handle a box update, called from the mqtt thread."""
+        self.hass.loop.call_soon_threadsafe(self._async_box_updated)
+
+    @callback
+    def async_attach_box(self, box: LGHorizonBox):
+        """Replace the box restored from the snapshot by the connected one."""
+        if box is self._box:
+            return
+        self._box.set_callback(None)
+        self._box = box
+        self.box_name = box.deviceFriendlyName
+        if self.hass is not None:
+            box.set_callback(self._box_callback)
+            self._async_box_updated()
+
+    async def async_will_remove_from_hass(self):
+        """Stop listening to the box."""
+        self._box.set_callback(None)
+        self._commands.async_clear()
+        if self._write_unsub:
+            self._write_unsub()
+            self._write_unsub = None
+
+    async def async_send_command(self, func, *args, supersede=None):
+        """Send a box command through the command queue of this box."""
+        self._metrics.command_sent()
+        await self._commands.async_send(func, *args, supersede=supersede)
+
+    async def async_search_recordings(self, query, limit):
+        """Search the recordings, the results can be played with play_media."""
+        results = await self._recordings.async_search(query, limit)
+        # The last search is listed in the media browser.
+        self._last_search = query
+        return {"query": query, "results": [result.as_dict() for result in results]}
+
+    async def async_send_key_sequence(self, steps, delay=0):
+        """Send key presses, publishing keys without a pause between them at once.
+
+        A step is a key, or a dict with the key, the delay after it and the
+        box state to wait for before the next step.
+        """
+        batch = []
+        for step in steps:
+            if isinstance(step, str):
+                step = {CONF_REMOTE_KEY: step}
+            batch.append(step[CONF_REMOTE_KEY])
+            step_delay = step.get(CONF_DELAY, delay)
+            wait_for = step.get(CONF_WAIT_FOR)
+            if not step_delay and not wait_for:
+                continue
+            await self.async_send_command(send_keys, self._box, batch)
+            batch = []
+            if wait_for and not await self._async_wait_for_box(
+                functools.partial(self._box_matches, wait_for),
+                wait_for[CONF_TIMEOUT],
+            ):
+                raise HomeAssistantError(
+                    f"Box {self.box_id} did not reach {wait_for} after key "
+                    f"{step[CONF_REMOTE_KEY]}"
+                )
+            if step_delay:
+                await asyncio.sleep(step_delay)
+        if batch:
+            await self.async_send_command(send_keys, self._box, batch)
+
+    def _box_matches(self, wait_for) -> bool:
+        """Return True if the box is in the state a key step waits for."""
+        playing_info = self._box.playing_info
+        state = player_state(self._box)
+        return (
+            wait_for.get(CONF_STATE, state) == state
+            and wait_for.get(CONF_PLAY_MODE, playing_info.source_type)
+            == playing_info.source_type
+            and wait_for.get(CONF_CHANNEL, playing_info.channel_title)
+            == playing_info.channel_title
+        )
+
+    async def _async_wait_for_box(self, predicate, timeout) -> bool:
+        """Wait until the box reports a state for which predicate is true."""
+        if predicate():
+            return True
+        waiter = (predicate, self.hass.loop.create_future())
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.remove(waiter)
+        return True
 
-        def refresh_callback():
-            self.hass.add_job(self._save_refresh_token)
+    @callback
+    def _async_box_updated(self):
+        """Schedule a single state write for a burst of box updates."""
+        self._metrics.box_updates += 1
+        for predicate, future in self._waiters:
+            if not future.done() and predicate():
+                future.set_result(None)
+        if self._write_unsub is None:
+            self._write_unsub = async_call_later(
+                self.hass, STATE_WRITE_DELAY, self._async_write_coalesced
+            )
 
-        self._box.set_callback(callback)
-        self.api.set_callback(refresh_callback)
+    @callback
+    def _async_write_coalesced(self, _now):
+        """Write the state if anything visible changed since the last write."""
+        self._write_unsub = None
+        self._update_position()
+        self._async_write_snapshot()
 
     @callback
-    def _save_refresh_token(self):
-        """Save the refresh token."""
-        if CONF_REFRESH_TOKEN in self.entry.data:
-            _LOGGER.info("New JWT stored (2): %s", self.api.refresh_token)
-            new_data = {**self.entry.data}
-            new_data[CONF_REFRESH_TOKEN] = self.api.refresh_token
-            self.hass.config_entries.async_update_entry(
-                self.entry, data=new_data
+    def _async_write_snapshot(self):
+        """Take a snapshot of the box and write it if it differs from the last."""
+        snapshot = self._take_snapshot()
+        if snapshot == self._snapshot:
+            return
+        self._snapshot = snapshot
+        self._metrics.state_written()
+        self.async_write_ha_state()
+        if snapshot.state in (MediaPlayerState.PLAYING, MediaPlayerState.PAUSED):
+            self._history.async_record(
+                self.box_id,
+                snapshot.channel_title,
+                snapshot.title,
+                snapshot.source_type,
             )
 
-    async def async_update(self):
-        """Update the box."""
-        pass
+    def _take_snapshot(self):
+        """Return what the entity shows of the box now."""
+        next_up = None
+        if self._box.playing_info.source_type == "linear":
+            next_up = self._epg.next_up(self._box.playing_info.channel_id)
+        return LGHorizonBoxSnapshot(
+            self._box, self._position, self._recording_capacity, next_up
+        )
+
+    def _update_position(self):
+        """Take over the position the box reported, if it was not expected."""
+        playing_info = self._box.playing_info
+        self._position.update(
+            playing_info.position,
+            playing_info.last_position_update,
+            playing_info.paused,
+        )
+
+    @property
+    def _recording_capacity(self):
+        """Return the account capacity, or the last value pushed by this box."""
+        if self._capacity.data is not None:
+            return self._capacity.data
+        return self._box.recording_capacity
 
     @property
     def name(self):
@@ -173,13 +516,7 @@ class LGHorizonMediaPlayer(MediaPlayerEntity):
     @property
     def state(self):
         """Return the state of the player."""
-        if self._box.state == ONLINE_RUNNING:
-            if self._box.playing_info is not None and self._box.playing_info.paused:
-                return MediaPlayerState.PAUSED
-            return MediaPlayerState.PLAYING
-        if self._box.state == ONLINE_STANDBY:
-            return MediaPlayerState.OFF
-        return STATE_UNAVAILABLE
+        return self._snapshot.state
 
     @property
     def media_content_type(self):
@@ -189,127 +526,109 @@ class LGHorizonMediaPlayer(MediaPlayerEntity):
     @property
     def supported_features(self):
         """Return the supported features."""
-        if self._box.playing_info.source_type == "app":
-            return (
-                MediaPlayerEntityFeature.PLAY
-                | MediaPlayerEntityFeature.PAUSE
-                | MediaPlayerEntityFeature.STOP
-                | MediaPlayerEntityFeature.TURN_ON
-                | MediaPlayerEntityFeature.TURN_OFF
-                | MediaPlayerEntityFeature.SELECT_SOURCE
-                | MediaPlayerEntityFeature.PLAY_MEDIA
-                | MediaPlayerEntityFeature.BROWSE_MEDIA
-                # | SUPPORT_SEEK
-            )
-        return (
-            MediaPlayerEntityFeature.PLAY
-            | MediaPlayerEntityFeature.PAUSE
-            | MediaPlayerEntityFeature.STOP
-            | MediaPlayerEntityFeature.TURN_ON
-            | MediaPlayerEntityFeature.TURN_OFF
-            | MediaPlayerEntityFeature.SELECT_SOURCE
-            | MediaPlayerEntityFeature.NEXT_TRACK
-            | MediaPlayerEntityFeature.PREVIOUS_TRACK
-            | MediaPlayerEntityFeature.PLAY_MEDIA
-            | MediaPlayerEntityFeature.BROWSE_MEDIA
-            # | SUPPORT_SEEK
-        )
+        return self._snapshot.supported_features
 
     @property
     def available(self):
         """Return True if the device is available."""
-        available = self._box.is_available()
-        return available
+        return self._snapshot.available
 
     async def async_turn_on(self):
         """Turn the media player on."""
-        self._box.turn_on()
+        await self.async_send_command(self._box.turn_on, supersede=SUPERSEDE_POWER)
 
     async def async_turn_off(self):
         """Turn the media player off."""
-        self._box.turn_off()
+        await self.async_send_command(self._box.turn_off, supersede=SUPERSEDE_POWER)
 
     @property
     def media_image_url(self):
         """Return the media image URL."""
-        image_url = self._box.playing_info.image
-        if image_url is None:
-            return None
+        return self._snapshot.image
 
-        if self._box.playing_info.source_type == "linear":
-            join_param = "?"
-            if join_param in self._box.playing_info.image:
-                join_param = "&"
-            image_url = f"{image_url}{join_param}{str(random.randrange(1000000))}"
-        return image_url
+    @property
+    def media_image_hash(self):
+        """Hash value for the artwork, changes when the programme changes."""
+        return self._snapshot.image_hash
+
+    async def async_get_media_image(self):
+        """Fetch the artwork through the thumbnail cache."""
+        snapshot = self._snapshot
+        if snapshot.image is None:
+            return None, None
+        return await self._thumbnails.async_get_image(
+            snapshot.artwork_identity, snapshot.image
+        )
 
     @property
     def media_title(self):
         """Return the media title."""
-        return self._box.playing_info.title
+        return self._snapshot.title
 
     @property
     def source(self):
         """Name of the current channel."""
-        return self._box.playing_info.channel_title
+        return self._snapshot.channel_title
 
     @property
     def source_list(self):
         """Return a list with available sources."""
-        return [channel for channel in self._channels.keys()]
+        return self._channels.index.source_list
 
     @property
     def media_duration(self) -> int | None:
         """Duration of current playing media in seconds."""
-        if self._box.playing_info.duration:
-            return int(self._box.playing_info.duration)
-        return None
+        return self._snapshot.duration
 
     @property
     def media_position(self) -> int | None:
         """Position of current playing media in seconds."""
-        if self._box.playing_info.position:
-            return int(self._box.playing_info.position)
-        return None
+        return self._snapshot.position
 
     @property
     def media_position_updated_at(self) -> dt.datetime | None:
         """When was the position of the current playing media valid."""
-        if self._box.playing_info.last_position_update:
-            return dt_util.utcnow()
-        return None
+        return self._snapshot.position_updated_at
 
     async def async_select_source(self, source):
         """Select a new source."""
-        self._box.set_channel(source)
+        if source not in self._channels.index.by_title:
+            _LOGGER.error("Unknown source %s", source)
+            return
+        await self.async_send_command(
+            self._box.set_channel, source, supersede=SUPERSEDE_ZAP
+        )
 
     async def async_media_play(self):
         """Play selected box."""
-        self._box.play()
+        await self.async_send_command(self._box.play, supersede=SUPERSEDE_PLAYBACK)
 
     async def async_media_pause(self):
         """Pause the given box."""
-        self._box.pause()
+        await self.async_send_command(self._box.pause, supersede=SUPERSEDE_PLAYBACK)
 
     async def async_media_stop(self):
         """Stop the given box."""
-        self._box.stop()
+        await self.async_send_command(self._box.stop, supersede=SUPERSEDE_PLAYBACK)
 
     async def async_media_next_track(self):
         """Send next track command."""
-        self._box.next_channel()
+        await self.async_send_command(self._box.next_channel)
 
     async def async_media_previous_track(self):
         """Send previous track command."""
-        self._box.previous_channel()
+        await self.async_send_command(self._box.previous_channel)
 
     async def async_play_media(self, media_type, media_id, **kwargs):
         """Support changing a channel."""
         if media_type == MediaType.EPISODE:
-            self._box.play_recording(media_id)
-            pass
+            await self.async_send_command(
+                self._box.play_recording, media_id, supersede=SUPERSEDE_ZAP
+            )
         elif media_type == MediaType.APP:
-            self._box.set_channel(media_id)
+            await self.async_send_command(
+                self._box.set_channel, media_id, supersede=SUPERSEDE_ZAP
+            )
         elif media_type == MediaType.CHANNEL:
             # media_id should only be a channel number
             try:
@@ -317,121 +636,293 @@ class LGHorizonMediaPlayer(MediaPlayerEntity):
             except vol.Invalid:
                 _LOGGER.error("Media ID must be positive integer")
                 return
-            if self._box.playing_info.source_type == "app":
-                self._box.send_key_to_box("TV")
-                time.sleep(1)
+            channel = self._channels.index.by_number.get(str(int(media_id)))
+            if channel is not None:
+                await self.async_send_command(
+                    self._box.set_channel, channel.title, supersede=SUPERSEDE_ZAP
+                )
+                return
 
-            for digit in media_id:
-                self._box.send_key_to_box(f"{digit}")
+            # Unknown number, let the box resolve it.
+            if self._box.playing_info.source_type == "app":
+                await self.async_send_command(self._box.send_key_to_box, "TV")
+                if not await self._async_wait_for_box(
+                    lambda: self._box.playing_info.source_type != "app",
+                    APP_EXIT_TIMEOUT,
+                ):
+                    _LOGGER.warning("Box %s did not leave the app", self.box_id)
+
+            await self.async_send_command(send_keys, self._box, list(media_id))
         else:
             _LOGGER.error("Unsupported media type")
 
     @property
     def extra_state_attributes(self):
         """Return device specific state attributes."""
-        return {
-            "play_mode": self._box.playing_info.source_type,
-            "channel": self._box.playing_info.channel_title,
-            "title": self._box.playing_info.title,
-            "image": self._box.playing_info.image,
-            "recording_capacity": self._box.recording_capacity,
-        }
+        return self._snapshot.attributes
 
     @property
     def should_poll(self):
-        return True
+        return False
 
     async def async_browse_media(self, media_content_type=None, media_content_id=None):
         _LOGGER.debug(f"{media_content_type} - {media_content_id}")
+        if not self._connection.connected:
+            raise BrowseError("Not connected yet")
         if media_content_type in [None, "main"]:
-            main = BrowseMedia(
-                title="Opnames",
-                media_class=MediaClass.DIRECTORY,
-                media_content_type="main",
-                media_content_id="main",
-                can_play=False,
-                can_expand=True,
-                children=[],
-                children_media_class=MediaClass.DIRECTORY,
+            return await self._async_browse_main()
+        content_id, page = _split_page(media_content_id)
+        if media_content_type in (BROWSE_RECENT, BROWSE_BUCKET):
+            return await self._async_browse_bucket(media_content_type, content_id, page)
+        if media_content_type == MediaType.TVSHOW:
+            return await self._async_browse_show(content_id, page)
+        if media_content_type == BROWSE_EPG:
+            return self._browse_epg()
+        if media_content_type == BROWSE_EPG_CHANNEL:
+            return self._browse_epg_channel(content_id)
+        if media_content_type == BROWSE_SEARCH:
+            return await self._async_browse_search(media_content_id)
+        return None
+
+    async def _async_browse_main(self):
+        main = BrowseMedia(
+            title="Opnames",
+            media_class=MediaClass.DIRECTORY,
+            media_content_type="main",
+            media_content_id="main",
+            can_play=False,
+            can_expand=True,
+            children=[],
+            children_media_class=MediaClass.DIRECTORY,
+        )
+        if len(self._epg.index):
+            main.children.append(_directory_media("Gids", BROWSE_EPG, BROWSE_EPG))
+        if self._last_search:
+            main.children.append(
+                _directory_media(
+                    f"Zoeken: {self._last_search}", BROWSE_SEARCH, self._last_search
+                )
             )
-            recordings = await self.hass.async_add_executor_job(self.api.get_recordings)
-            for recording in recordings:
-                if type(recording) is LGHorizonRecordingListSeasonShow:
-                    show: LGHorizonRecordingListSeasonShow = recording
-                    show_media = BrowseMedia(
-                        title=show.title,
-                        media_class=MediaClass.TV_SHOW,
-                        media_content_type=MediaType.TVSHOW,
-                        media_content_id=show.showId,
-                        can_play=False,
-                        can_expand=True,
-                        thumbnail=show.image,
-                        children=[],
-                        children_media_class=MediaClass.DIRECTORY,
-                    )
-                    main.children.append(show_media)
-                if type(recording) is LGHorizonRecordingSingle:
-                    single: LGHorizonRecordingSingle = recording
-                    single_media = BrowseMedia(
-                        title=single.title,
-                        media_class=MediaClass.EPISODE,
-                        media_content_type=MediaType.EPISODE,
-                        media_content_id=single.id,
-                        can_play=True,
-                        can_expand=False,
-                        thumbnail=single.image,
-                    )
-                    main.children.append(single_media)
+        index = await self._recordings.async_get_index()
+        if index.count <= BROWSE_PAGE_SIZE:
+            main.children.extend(self._recordings_media(index.recordings))
             return main
-        elif media_content_type == MediaType.TVSHOW:
-            episodes_data = await self.hass.async_add_executor_job(
-                self.api.get_recording_show, media_content_id
+
+        main.children.append(_directory_media("Recent", BROWSE_RECENT, BROWSE_RECENT))
+        for name, recordings in index.buckets.items():
+            main.children.append(
+                _directory_media(f"{name} ({len(recordings)})", BROWSE_BUCKET, name)
             )
-            children = []
-
-            for episode_data in episodes_data:
-                if type(episode_data) is LGHorizonRecordingEpisode:
-                    episode_recording: LGHorizonRecordingEpisode = episode_data
-                    planned: bool = episode_recording.recordingState == "planned"
-                    title = f"S{episode_recording.seasonNumber:02} E{episode_recording.episodeNumber:02}: {episode_recording.showTitle} - {episode_recording.episodeTitle}"
-                    if planned:
-                        title += " (planned)"
-                    episode_media = BrowseMedia(
-                        title=title,
-                        media_class=MediaClass.EPISODE,
-                        media_content_type=MediaType.EPISODE,
-                        media_content_id=episode_recording.episodeId,
-                        can_play=not planned,
-                        can_expand=False,
-                        thumbnail=episode_recording.image,
-                    )
-                    children.append(episode_media)
-                elif type(episode_data) is LGHorizonRecordingShow:
-                    show_recording: LGHorizonRecordingShow = episode_data
-                    planned: bool = show_recording.recordingState == "planned"
-                    title = f"S{show_recording.seasonNumber:02} E{show_recording.episodeNumber:02}: {show_recording.showTitle}"
-                    if planned:
-                        title += " (planned)"
-                    show_media = BrowseMedia(
-                        title=title,
-                        media_class=MediaClass.EPISODE,
-                        media_content_type=MediaType.EPISODE,
-                        media_content_id=show_recording.episodeId,
-                        can_play=not planned,
-                        can_expand=False,
-                        thumbnail=show_recording.image,
-                    )
-                    children.append(show_media)
-            show_container = BrowseMedia(
-                title=episodes_data[0].showTitle,
-                media_class=MediaClass.DIRECTORY,
-                media_content_type=MediaType.TVSHOW,
-                media_content_id=MediaType.TVSHOW,
-                can_play=False,
-                can_expand=False,
-                children=children,
-                children_media_class=MediaClass.EPISODE,
-                thumbnail=episodes_data[0].image,
+        return main
+
+    async def _async_browse_bucket(self, media_content_type, bucket, page):
+        index = await self._recordings.async_get_index()
+        if media_content_type == BROWSE_RECENT:
+            title = "Recent"
+            recordings = index.recent
+        else:
+            title = bucket
+            recordings = index.buckets.get(bucket, ())
+        container = _directory_media(title, media_content_type, _page_id(bucket, page))
+        start = page * BROWSE_PAGE_SIZE
+        container.children = self._recordings_media(
+            recordings[start : start + BROWSE_PAGE_SIZE]
+        )
+        if start + BROWSE_PAGE_SIZE < len(recordings):
+            container.children.append(
+                _directory_media(
+                    f"{title} ({page + 2})",
+                    media_content_type,
+                    _page_id(bucket, page + 1),
+                )
             )
-            return show_container
-        return None
+        return container
+
+    def _browse_epg(self):
+        container = _directory_media("Gids", BROWSE_EPG, BROWSE_EPG)
+        for channel in self._channels.index.channels:
+            on_now = self._epg.on_now(channel.id)
+            title = channel.title
+            if on_now is not None:
+                title = f"{title}: {on_now.title}"
+            node = _directory_media(title, BROWSE_EPG_CHANNEL, channel.id)
+            node.thumbnail = self._browse_thumbnail(channel.logo_image)
+            container.children.append(node)
+        return container
+
+    def _browse_epg_channel(self, channel_id):
+        channel = self._channels.index.by_id.get(channel_id)
+        if channel is None:
+            raise BrowseError(f"Unknown channel {channel_id}")
+        container = _directory_media(channel.title, BROWSE_EPG_CHANNEL, channel_id)
+        container.thumbnail = self._browse_thumbnail(channel.logo_image)
+        container.children_media_class = MediaClass.EPISODE
+        for event in self._epg.upcoming(channel_id):
+            container.children.append(
+                BrowseMedia(
+                    title=f"{event.start_time:%H:%M} {event.title}",
+                    media_class=MediaClass.EPISODE,
+                    media_content_type=BROWSE_EPG_CHANNEL,
+                    media_content_id=event.id,
+                    can_play=False,
+                    can_expand=False,
+                )
+            )
+        return container
+
+    async def _async_browse_search(self, query):
+        results = await self._recordings.async_search(query, BROWSE_PAGE_SIZE)
+        container = _directory_media(f"Zoeken: {query}", BROWSE_SEARCH, query)
+        for result in results:
+            title = result.title
+            if result.season is not None and result.episode is not None:
+                title = f"S{result.season:02} E{result.episode:02}: {title}"
+            show = result.media_content_type == MediaType.TVSHOW
+            container.children.append(
+                BrowseMedia(
+                    title=title,
+                    media_class=MediaClass.TV_SHOW if show else MediaClass.EPISODE,
+                    media_content_type=result.media_content_type,
+                    media_content_id=result.media_content_id,
+                    can_play=result.can_play,
+                    can_expand=show,
+                    thumbnail=self._browse_thumbnail(result.image),
+                )
+            )
+        return container
+
+    def _recordings_media(self, recordings):
+        children = []
+        for recording in recordings:
+            if type(recording) is LGHorizonRecordingListSeasonShow:
+                show: LGHorizonRecordingListSeasonShow = recording
+                show_media = BrowseMedia(
+                    title=show.title,
+                    media_class=MediaClass.TV_SHOW,
+                    media_content_type=MediaType.TVSHOW,
+                    media_content_id=show.showId,
+                    can_play=False,
+                    can_expand=True,
+                    thumbnail=self._browse_thumbnail(show.image),
+                    children=[],
+                    children_media_class=MediaClass.DIRECTORY,
+                )
+                children.append(show_media)
+            if type(recording) is LGHorizonRecordingSingle:
+                single: LGHorizonRecordingSingle = recording
+                single_media = BrowseMedia(
+                    title=single.title,
+                    media_class=MediaClass.EPISODE,
+                    media_content_type=MediaType.EPISODE,
+                    media_content_id=single.id,
+                    can_play=True,
+                    can_expand=False,
+                    thumbnail=self._browse_thumbnail(single.image),
+                )
+                children.append(single_media)
+        return children
+
+    async def _async_browse_show(self, show_id, page):
+        episodes_data = await self._recordings.async_get_show(show_id)
+        start = page * BROWSE_PAGE_SIZE
+        children = []
+
+        # Only the titles of the requested page are built.
+        for episode_data in episodes_data[start : start + BROWSE_PAGE_SIZE]:
+            if type(episode_data) is LGHorizonRecordingEpisode:
+                episode_recording: LGHorizonRecordingEpisode = episode_data
+                planned: bool = episode_recording.recordingState == "planned"
+                title = f"S{episode_recording.seasonNumber:02} E{episode_recording.episodeNumber:02}: {episode_recording.showTitle} - {episode_recording.episodeTitle}"
+                if planned:
+                    title += " (planned)"
+                episode_media = BrowseMedia(
+                    title=title,
+                    media_class=MediaClass.EPISODE,
+                    media_content_type=MediaType.EPISODE,
+                    media_content_id=episode_recording.episodeId,
+                    can_play=not planned,
+                    can_expand=False,
+                    thumbnail=self._browse_thumbnail(episode_recording.image),
+                )
+                children.append(episode_media)
+            elif type(episode_data) is LGHorizonRecordingShow:
+                show_recording: LGHorizonRecordingShow = episode_data
+                planned: bool = show_recording.recordingState == "planned"
+                title = f"S{show_recording.seasonNumber:02} E{show_recording.episodeNumber:02}: {show_recording.showTitle}"
+                if planned:
+                    title += " (planned)"
+                show_media = BrowseMedia(
+                    title=title,
+                    media_class=MediaClass.EPISODE,
+                    media_content_type=MediaType.EPISODE,
+                    media_content_id=show_recording.episodeId,
+                    can_play=not planned,
+                    can_expand=False,
+                    thumbnail=self._browse_thumbnail(show_recording.image),
+                )
+                children.append(show_media)
+        if start + BROWSE_PAGE_SIZE < len(episodes_data):
+            children.append(
+                _directory_media(
+                    f"{episodes_data[0].showTitle} ({page + 2})",
+                    MediaType.TVSHOW,
+                    _page_id(show_id, page + 1),
+                )
+            )
+        show_container = BrowseMedia(
+            title=episodes_data[0].showTitle,
+            media_class=MediaClass.DIRECTORY,
+            media_content_type=MediaType.TVSHOW,
+            media_content_id=_page_id(show_id, page),
+            can_play=False,
+            can_expand=False,
+            children=children,
+            children_media_class=MediaClass.EPISODE,
+            thumbnail=self._browse_thumbnail(episodes_data[0].image),
+        )
+        return show_container
+
+    def _browse_thumbnail(self, url):
+        """Return the url of artwork served from the thumbnail cache."""
+        if not url:
+            return None
+        return self.get_browse_image_url(
+            BROWSE_IMAGE, self._thumbnails.async_register(url)
+        )
+
+    async def async_get_browse_image(
+        self, media_content_type, media_content_id, media_image_id=None
+    ):
+        """Serve media browser artwork from the thumbnail cache."""
+        if media_content_type != BROWSE_IMAGE:
+            return None, None
+        return await self._thumbnails.async_get_registered(media_content_id)
+
+
+def _directory_media(title, media_content_type, media_content_id):
+    """Return an expandable browse node."""
+    return BrowseMedia(
+        title=title,
+        media_class=MediaClass.DIRECTORY,
+        media_content_type=media_content_type,
+        media_content_id=media_content_id,
+        can_play=False,
+        can_expand=True,
+        children=[],
+        children_media_class=MediaClass.DIRECTORY,
+    )
+
+
+def _page_id(content_id, page):
+    """Return the browse id of a page of content_id."""
+    if page == 0:
+        return content_id
+    return f"{content_id}{PAGE_SEPARATOR}{page}"
+
+
+def _split_page(media_content_id):
+    """Split a browse id into the content id and the page number."""
+    content_id, separator, page = media_content_id.rpartition(PAGE_SEPARATOR)
+    if separator and page.isdigit():
+        return content_id, int(page)
+    return media_content_id, 0
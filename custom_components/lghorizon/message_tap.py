@@ -0,0 +1,47 @@
+"""Tap into the mqtt messages received by the LG Horizon api."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+from typing import Any
+
+from lghorizon import LGHorizonApi
+
+_LOGGER = logging.getLogger(__name__)
+
+MessageListener = Callable[[Any, str], None]
+
+
+class LGHorizonMessageTap:
+    """Forward every mqtt message the api handles to extra listeners.
+
+    Listeners are called from the mqtt thread, before the api processes the
+    message, and must not block.
+    """
+
+    def __init__(self, api: LGHorizonApi) -> None:
+        """Init the tap."""
+        self._api = api
+        self._listeners: list[MessageListener] = []
+
+    def install(self) -> None:
+        """Route the messages of the current mqtt client through the tap."""
+        # The api hands its own handler to the mqtt client on connect.
+        self._api._mqttClient._on_message_callback = self._on_message
+
+    def add_listener(self, listener: MessageListener) -> Callable[[], None]:
+        """Add a listener and return a function that removes it again."""
+        self._listeners.append(listener)
+
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
+
+    def _on_message(self, message: Any, topic: str) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(message, topic)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error in mqtt message listener")
+        self._api._on_mqtt_message(message, topic)
@@ -0,0 +1,224 @@
+"""Performance counters of a LG Horizon account."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Callable
+import functools
+import threading
+import time
+from typing import Any
+
+from lghorizon import LGHorizonApi
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Commands not confirmed by a state change within this time are not timed.
+COMMAND_CONFIRM_TIMEOUT = 30
+RATE_WINDOW = 60
+
+# Api calls that are timed.
+TIMED_API_CALLS = (
+    "get_recordings",
+    "get_recording_show",
+    "get_recording_capacity",
+    "_authorize",
+)
+
+
+class LGHorizonLatency:
+    """Count and histogram of durations, safe to record from any thread."""
+
+    __slots__ = ("count", "errors", "total", "max", "last", "buckets", "_lock")
+
+    def __init__(self) -> None:
+        """Init the histogram."""
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last: float | None = None
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add a duration."""
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.last = seconds
+            self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def record_error(self) -> None:
+        """Count a failure."""
+        with self._lock:
+            self.errors += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram for diagnostics."""
+        labels = [f"<={bound * 1000:g}ms" for bound in LATENCY_BUCKETS]
+        labels.append(f">{LATENCY_BUCKETS[-1] * 1000:g}ms")
+        with self._lock:
+            return {
+                "count": self.count,
+                "errors": self.errors,
+                "mean_ms": (
+                    round(self.total / self.count * 1000, 1) if self.count else None
+                ),
+                "max_ms": round(self.max * 1000, 1),
+                "histogram": dict(zip(labels, self.buckets)),
+            }
+
+
+class LGHorizonRate:
+    """Number of events, and their rate over the last full minute.
+
+    Events are recorded from the mqtt thread and read from the event loop.
+    """
+
+    __slots__ = ("total", "per_minute", "_window_start", "_window_count", "_lock")
+
+    def __init__(self) -> None:
+        """Init the rate."""
+        self.total = 0
+        self.per_minute = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+
+    def record(self) -> None:
+        """Count an event."""
+        with self._lock:
+            self.total += 1
+            self._window_count += 1
+            self._roll(time.monotonic())
+
+    def current(self) -> float:
+        """Return the events per minute."""
+        with self._lock:
+            self._roll(time.monotonic())
+            return self.per_minute
+
+    def _roll(self, now: float) -> None:
+        elapsed = now - self._window_start
+        if elapsed >= RATE_WINDOW:
+            self.per_minute = round(self._window_count * 60 / elapsed, 1)
+            self._window_start = now
+            self._window_count = 0
+
+
+class LGHorizonBoxMetrics:
+    """Counters of a single box."""
+
+    __slots__ = ("mqtt_messages", "box_updates", "state_writes", "commands", "_sent")
+
+    def __init__(self) -> None:
+        """Init the counters."""
+        self.mqtt_messages = LGHorizonRate()
+        self.box_updates = 0
+        self.state_writes = 0
+        self.commands = LGHorizonLatency()
+        self._sent: float | None = None
+
+    @property
+    def coalesced_writes(self) -> int:
+        """Return the box updates that did not lead to a state write."""
+        return self.box_updates - self.state_writes
+
+    def command_sent(self) -> None:
+        """Start timing a command, unless an earlier one is still unconfirmed."""
+        now = time.monotonic()
+        if self._sent is None or now - self._sent > COMMAND_CONFIRM_TIMEOUT:
+            self._sent = now
+
+    def state_written(self) -> None:
+        """Count a state write, it confirms the pending command."""
+        self.state_writes += 1
+        if self._sent is not None:
+            elapsed = time.monotonic() - self._sent
+            if elapsed <= COMMAND_CONFIRM_TIMEOUT:
+                self.commands.record(elapsed)
+            self._sent = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters for diagnostics."""
+        return {
+            "mqtt_messages": self.mqtt_messages.total,
+            "mqtt_messages_per_minute": self.mqtt_messages.current(),
+            "box_updates": self.box_updates,
+            "state_writes": self.state_writes,
+            "coalesced_writes": self.coalesced_writes,
+            "command_latency": self.commands.as_dict(),
+        }
+
+
+class LGHorizonMetrics:
+    """Counters of an account, cheap enough to always collect."""
+
+    def __init__(self) -> None:
+        """Init the counters."""
+        self.mqtt_messages = LGHorizonRate()
+        self.api_calls = {name: LGHorizonLatency() for name in TIMED_API_CALLS}
+        # Exchanges of a refresh token for new tokens, not logins.
+        self.token_refreshes = 0
+        self._lock = threading.Lock()
+        self.boxes: dict[str, LGHorizonBoxMetrics] = {}
+
+    def box(self, box_id: str) -> LGHorizonBoxMetrics:
+        """Return the counters of a box."""
+        if box_id not in self.boxes:
+            self.boxes[box_id] = LGHorizonBoxMetrics()
+        return self.boxes[box_id]
+
+    def instrument(self, api: LGHorizonApi) -> None:
+        """Time the api calls of interest."""
+        for name in TIMED_API_CALLS:
+            setattr(api, name, self._timed(name, getattr(api, name)))
+        # Only the gb operators authorize with the refresh token.
+        api.authorize_gb = self._counted_refresh(api.authorize_gb)
+
+    def _timed(self, name: str, func: Callable) -> Callable:
+        latency = self.api_calls[name]
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                latency.record_error()
+                raise
+            latency.record(time.monotonic() - start)
+            return result
+
+        return timed
+
+    def _counted_refresh(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def counted(*args, **kwargs):
+            result = func(*args, **kwargs)
+            with self._lock:
+                self.token_refreshes += 1
+            return result
+
+        return counted
+
+    def handle_message(self, message: Any, topic: str) -> None:
+        """Count an mqtt message, called from mqtt."""
+        self.mqtt_messages.record()
+        parts = topic.split("/")
+        if len(parts) > 1 and parts[1] in self.boxes:
+            self.boxes[parts[1]].mqtt_messages.record()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters for diagnostics."""
+        return {
+            "mqtt_messages": self.mqtt_messages.total,
+            "mqtt_messages_per_minute": self.mqtt_messages.current(),
+            "token_refreshes": self.token_refreshes,
+            "api_calls": {
+                name.lstrip("_"): latency.as_dict()
+                for name, latency in self.api_calls.items()
+            },
+            "boxes": {box_id: box.as_dict() for box_id, box in self.boxes.items()},
+        }
@@ -0,0 +1,226 @@
+"""Backend resources shared by the accounts of one operator."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import copy
+from datetime import datetime
+import functools
+import logging
+import threading
+import time
+from typing import Any
+
+from requests.adapters import HTTPAdapter
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from lghorizon import LGHorizonApi
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_OPERATOR_POOLS = "lghorizon_operator_pools"
+DATA_VALIDATED_APIS = "lghorizon_validated_apis"
+# How long an api authorized by the config flow is handed to the new entry.
+VALIDATED_API_MAX_AGE = 300
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 10
+# Expired responses are dropped once this many are kept.
+SHARED_RESPONSES_PURGE = 500
+
+# Responses that are the same for every account of an operator, with how
+# long they are shared, in seconds. Entitlements are applied by the api
+# after the lineup is fetched, so the lineup itself is not personal. Every
+# box that tunes to a programme looks up its replay event. Every caller gets
+# its own copy, the apis change what they are handed.
+SHARED_LINEUP = "/v2/channels?"
+SHARED_RESPONSES = (
+    ("/config-service/conf/web/backoffice.json", 24 * 3600),
+    (SHARED_LINEUP, 3600),
+    ("/v2/replayEvent/", 600),
+    ("/events/segments/", 3600),
+)
+
+
+@callback
+def async_get_operator_pool(
+    hass: HomeAssistant, country_code: str
+) -> LGHorizonOperatorPool:
+    """Return the pool of an operator, keyed by its country code."""
+    pools = hass.data.setdefault(DATA_OPERATOR_POOLS, {})
+    if country_code not in pools:
+        pools[country_code] = LGHorizonOperatorPool(country_code)
+    return pools[country_code]
+
+
+class _SharedResponse:
+    """A response, or the fetch of it that other accounts wait for."""
+
+    __slots__ = ("expires", "value", "done")
+
+    def __init__(self) -> None:
+        self.expires = 0.0
+        self.value: Any = None
+        self.done = threading.Event()
+
+
+class LGHorizonOperatorPool:
+    """HTTP connections and static responses of an operator.
+
+    The accounts keep their own session, and with it their own cookies and
+    tokens. Only the connection pool below the sessions is shared. Identical
+    requests of several accounts that run at the same time, as happens when
+    Home Assistant starts, are sent to the backend once.
+    """
+
+    def __init__(self, country_code: str) -> None:
+        """Init the pool."""
+        self.country_code = country_code
+        self.adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE
+        )
+        self._lock = threading.Lock()
+        self._responses: dict[str, _SharedResponse] = {}
+        self.fetches = 0
+        self.shared = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the counters for diagnostics."""
+        return {"fetches": self.fetches, "shared": self.shared}
+
+    def get(self, url: str, fetch: Callable[[], Any]) -> Any:
+        """Return the shared response for url, calling fetch when there is none."""
+        ttl = _shared_ttl(url)
+        if ttl is None:
+            return fetch()
+        return copy.deepcopy(self._get_shared(url, ttl, fetch))
+
+    def invalidate(self, part: str) -> None:
+        """Fetch the shared responses whose url contains part again."""
+        with self._lock:
+            for url, response in list(self._responses.items()):
+                if part in url and response.done.is_set():
+                    del self._responses[url]
+
+    def _get_shared(self, url: str, ttl: int, fetch: Callable[[], Any]) -> Any:
+        with self._lock:
+            now = time.monotonic()
+            response = self._responses.get(url)
+            owner = response is None or (
+                response.done.is_set() and response.expires <= now
+            )
+            if owner:
+                if len(self._responses) >= SHARED_RESPONSES_PURGE:
+                    self._purge(now)
+                response = _SharedResponse()
+                self._responses[url] = response
+        if not owner:
+            response.done.wait()
+            if response.value is not None:
+                self.shared += 1
+                return response.value
+            return fetch()
+
+        try:
+            response.value = fetch()
+            response.expires = time.monotonic() + ttl
+            self.fetches += 1
+        except Exception:
+            with self._lock:
+                self._responses.pop(url, None)
+            raise
+        finally:
+            response.done.set()
+        return response.value
+
+    def _purge(self, now: float) -> None:
+        for url, response in list(self._responses.items()):
+            if response.done.is_set() and response.expires <= now:
+                del self._responses[url]
+
+
+def _shared_ttl(url: str) -> int | None:
+    for part, ttl in SHARED_RESPONSES:
+        if part in url:
+            return ttl
+    return None
+
+
+@callback
+def async_store_validated_api(hass: HomeAssistant, api: LGHorizonPooledApi) -> None:
+    """Keep an api the config flow authorized for the entry it creates."""
+    validated = hass.data.setdefault(DATA_VALIDATED_APIS, {})
+    key = (api._country_code, api.username)
+    validated[key] = (time.monotonic(), api)
+
+    @callback
+    def async_expire(_now: datetime) -> None:
+        # The flow was aborted, or the entry did not pick the api up.
+        if validated.get(key, (None, None))[1] is api:
+            del validated[key]
+
+    async_call_later(hass, VALIDATED_API_MAX_AGE, async_expire)
+
+
+@callback
+def async_pop_validated_api(
+    hass: HomeAssistant,
+    country_code: str,
+    username: str,
+    password: str,
+    identifier: str | None,
+) -> LGHorizonPooledApi | None:
+    """Return the api the config flow authorized for these credentials."""
+    validated = hass.data.get(DATA_VALIDATED_APIS, {})
+    stored, api = validated.pop((country_code, username), (None, None))
+    if (
+        api is None
+        or time.monotonic() - stored > VALIDATED_API_MAX_AGE
+        or api.password != password
+        or api._identifier != identifier
+    ):
+        return None
+    return api
+
+
+class LGHorizonPooledApi(LGHorizonApi):
+    """LGHorizonApi that uses the resources of its operator pool."""
+
+    def __init__(self, pool: LGHorizonOperatorPool, *args, **kwargs) -> None:
+        """Init the api."""
+        super().__init__(*args, **kwargs)
+        self._pool = pool
+        self._session.mount("https://", pool.adapter)
+        self._session.mount("http://", pool.adapter)
+        self._authorized = False
+        self._reuse_authorization = False
+
+    def authorize(self) -> None:
+        """Authorize without connecting; a following connect reuses the tokens."""
+        self._authorize()
+        self._authorized = True
+
+    def connect(self) -> None:
+        """Connect, authorizing again only if authorize was not called before."""
+        self._connect(super().connect)
+
+    def connect_once(self) -> None:
+        """Connect without the retries of the library, a failure raises."""
+        self._connect(functools.partial(LGHorizonApi.connect.__wrapped__, self))
+
+    def _connect(self, connect: Callable[[], None]) -> None:
+        # Only the first authorization of the connect is skipped, a retry
+        # and any later re-authorization go to the backend.
+        self._reuse_authorization = self._authorized
+        self._authorized = False
+        connect()
+
+    def _authorize(self) -> None:
+        if self._reuse_authorization:
+            self._reuse_authorization = False
+            return
+        super()._authorize()
+
+    def _do_api_call(self, url: str, tries: int = 0) -> Any:
+        return self._pool.get(url, functools.partial(super()._do_api_call, url))
@@ -0,0 +1,46 @@
+"""Playback position of a LG Horizon box."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+# Drift between a reported and an extrapolated position that counts as a seek.
+POSITION_TOLERANCE = 2.0
+
+
+class LGHorizonPositionTracker:
+    """The position reported to Home Assistant, and when it was valid.
+
+    Home Assistant extrapolates the position of a playing player itself. A
+    new report from the box is only taken over when it does not match that
+    extrapolation, so after a seek, pause or resume.
+    """
+
+    __slots__ = ("position", "updated_at", "paused")
+
+    def __init__(self) -> None:
+        """Init the tracker."""
+        self.position: float | None = None
+        self.updated_at: datetime | None = None
+        self.paused = False
+
+    def update(
+        self, position: float | None, updated_at: datetime | None, paused: bool
+    ) -> bool:
+        """Take over a report from the box, return True if it changed."""
+        if position is None or updated_at is None:
+            changed = self.position is not None
+            self.position = self.updated_at = None
+            return changed
+
+        # The box reports naive local times.
+        updated_at = updated_at.astimezone(timezone.utc)
+        if self.position is not None and paused == self.paused:
+            expected = self.position
+            if not paused:
+                expected += (updated_at - self.updated_at).total_seconds()
+            if abs(expected - position) <= POSITION_TOLERANCE:
+                return False
+        self.position = position
+        self.updated_at = updated_at
+        self.paused = paused
+        return True
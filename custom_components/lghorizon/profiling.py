@@ -0,0 +1,231 @@
+"""Sampling profiler for the code paths of the LG Horizon integration."""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from types import FrameType
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+import lghorizon
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_PROFILER = "lghorizon_profiler"
+PROFILE_DEFAULT_DURATION = timedelta(minutes=1)
+PROFILE_MAX_DURATION = timedelta(minutes=10)
+SAMPLE_INTERVAL = 0.01
+MEMORY_FRAMES = 10
+TOP_FUNCTIONS = 50
+TOP_ALLOCATIONS = 50
+
+# Samples are kept when one of their frames runs code from these folders,
+# from the first such frame down to the frame that was running.
+PROFILED_PATHS = (
+    os.path.dirname(os.path.abspath(__file__)),
+    os.path.dirname(os.path.abspath(lghorizon.__file__)),
+)
+
+
+@callback
+def async_get_profiler(hass: HomeAssistant) -> LGHorizonProfiler:
+    """Return the profiler shared by all entries."""
+    if DATA_PROFILER not in hass.data:
+        hass.data[DATA_PROFILER] = LGHorizonProfiler(hass)
+    return hass.data[DATA_PROFILER]
+
+
+def _in_profiled_code(filename: str) -> bool:
+    return filename.startswith(PROFILED_PATHS)
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def _profiled_stack(frame: FrameType | None) -> tuple[str, ...] | None:
+    """Return the stack from the outermost profiled frame to the running one."""
+    frames = []
+    outermost = None
+    while frame is not None:
+        frames.append(frame)
+        if _in_profiled_code(frame.f_code.co_filename):
+            outermost = len(frames)
+        frame = frame.f_back
+    if outermost is None:
+        return None
+    return tuple(_label(frame) for frame in reversed(frames[:outermost]))
+
+
+class _Sampler(threading.Thread):
+    """Takes the stacks of all threads at a fixed interval."""
+
+    def __init__(self) -> None:
+        super().__init__(name="lghorizon_profiler", daemon=True)
+        self.stacks: Counter[tuple[str, tuple[str, ...]]] = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = _profiled_stack(frame)
+                if stack:
+                    self.stacks[(names.get(ident, str(ident)), stack)] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+class LGHorizonProfiler:
+    """Samples the integration and traces its memory for a limited time.
+
+    Nothing is installed while the profiler is off. While on, a thread takes
+    the stacks of all threads a hundred times a second and tracemalloc traces
+    the allocations. The result is written to a JSON file in the
+    configuration folder, with the stacks in the collapsed format that
+    flame graph tools read.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Init the profiler."""
+        self.hass = hass
+        self.path: str | None = None
+        self._sampler: _Sampler | None = None
+        self._memory_start: tracemalloc.Snapshot | None = None
+        self._started_tracing = False
+        self._started: datetime | None = None
+        self._start = 0.0
+        self._unsub_stop: CALLBACK_TYPE | None = None
+
+    @property
+    def running(self) -> bool:
+        """Return True while profiling."""
+        return self._sampler is not None
+
+    async def async_start(self, duration: timedelta) -> None:
+        """Start profiling, for at most duration."""
+        if self.running:
+            await self.async_stop()
+        await self.hass.async_add_executor_job(self._start_memory)
+        self._started = dt_util.now()
+        self._start = time.monotonic()
+        self._sampler = _Sampler()
+        self._sampler.start()
+        self._unsub_stop = async_call_later(
+            self.hass, duration, self._async_stop_after_duration
+        )
+        _LOGGER.info("Profiling for at most %s", duration)
+
+    async def async_stop(self) -> str | None:
+        """Stop profiling and return the path of the result."""
+        if not self.running:
+            return None
+        if self._unsub_stop:
+            self._unsub_stop()
+            self._unsub_stop = None
+        sampler, self._sampler = self._sampler, None
+        duration = time.monotonic() - self._start
+        path = self.hass.config.path(
+            f"lghorizon_profile_{self._started:%Y%m%d_%H%M%S}.json"
+        )
+        await self.hass.async_add_executor_job(
+            self._stop_and_write, sampler, duration, path
+        )
+        self.path = path
+        _LOGGER.info("Profile of %.0fs written to %s", duration, path)
+        return path
+
+    @callback
+    def _async_stop_after_duration(self, _now: datetime) -> None:
+        self._unsub_stop = None
+        self.hass.async_create_task(self.async_stop())
+
+    def _start_memory(self) -> None:
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(MEMORY_FRAMES)
+        self._memory_start = _memory_snapshot()
+
+    def _stop_and_write(self, sampler: _Sampler, duration: float, path: str) -> None:
+        sampler.stop()
+        memory_end = _memory_snapshot()
+        if self._started_tracing:
+            tracemalloc.stop()
+        memory = memory_end.compare_to(self._memory_start, "lineno")
+        self._memory_start = None
+        profile = {
+            "started": self._started.isoformat(),
+            "duration_s": round(duration, 1),
+            "sample_interval_ms": SAMPLE_INTERVAL * 1000,
+            "samples": sampler.samples,
+            "threads": _threads(sampler.stacks),
+            "functions": _functions(sampler.stacks, sampler.samples),
+            "memory": [
+                {
+                    "line": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_kb": round(stat.size / 1024, 1),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in memory[:TOP_ALLOCATIONS]
+            ],
+            "collapsed": [
+                f"{';'.join((thread, *stack))} {count}"
+                for (thread, stack), count in sampler.stacks.most_common()
+            ],
+        }
+        with open(path, "w", encoding="utf-8") as profile_file:
+            json.dump(profile, profile_file, indent=1)
+
+
+def _memory_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(True, f"{path}{os.sep}*") for path in PROFILED_PATHS]
+    )
+
+
+def _threads(stacks: Counter) -> dict[str, int]:
+    """Return the samples per thread, the event loop runs in MainThread."""
+    threads: Counter[str] = Counter()
+    for (thread, _stack), count in stacks.items():
+        threads[thread] += count
+    return dict(threads.most_common())
+
+
+def _functions(stacks: Counter, samples: int) -> list[dict[str, Any]]:
+    """Return the functions seen most, with the share of samples they ran in."""
+    total: Counter[str] = Counter()
+    own: Counter[str] = Counter()
+    for (_thread, stack), count in stacks.items():
+        for label in set(stack):
+            total[label] += count
+        own[stack[-1]] += count
+    return [
+        {
+            "function": label,
+            "samples": count,
+            "self_samples": own[label],
+            "share": round(count / samples, 4) if samples else 0,
+        }
+        for label, count in total.most_common(TOP_FUNCTIONS)
+    ]
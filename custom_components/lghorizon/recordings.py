@@ -0,0 +1,466 @@
+"""Cache of the recordings of a LG Horizon account."""
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+import re
+import time
+from typing import Any, NamedTuple
+import unicodedata
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+
+from lghorizon import (
+    LGHorizonApi,
+    LGHorizonRecordingEpisode,
+    LGHorizonRecordingListSeasonShow,
+    LGHorizonRecordingShow,
+    LGHorizonRecordingSingle,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+RECORDINGS_TTL = timedelta(minutes=15)
+# Recording activity arrives in bursts, refresh once it settled.
+INVALIDATE_COOLDOWN = 2
+
+RECORDINGS_KEY = "recordings"
+
+# Alphabetical buckets used to browse large recording libraries.
+BUCKETS = (
+    ("A-F", "abcdef"),
+    ("G-L", "ghijkl"),
+    ("M-R", "mnopqr"),
+    ("S-Z", "stuvwxyz"),
+)
+OTHER_BUCKET = "#"
+RECENT_COUNT = 50
+SEARCH_LIMIT = 25
+# Shows matching a search whose episodes are fetched, when never opened.
+SEARCH_SHOWS_MAX = 5
+
+# Media types of search results, as play_media and browse_media expect them.
+MEDIA_TYPE_EPISODE = "episode"
+MEDIA_TYPE_TVSHOW = "tvshow"
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SEASON_EPISODE = re.compile(r"^s(\d+)e(\d+)$|^s(\d+)$|^e(\d+)$")
+
+
+def is_recording_activity(message: Any, topic: str) -> bool:
+    """Return True if an mqtt message reports a change in the recordings."""
+    if "/recordingStatus" in topic or topic.endswith("Recordings"):
+        return True
+    return isinstance(message, dict) and "CPE.capacity" in message
+
+
+class LGHorizonRecordingsIndex:
+    """Browse index over a recordings list, built once per refresh."""
+
+    def __init__(self, recordings: list) -> None:
+        """Build the index."""
+        self.recordings = tuple(recordings)
+        # get_recordings returns the newest recordings first.
+        self.recent = self.recordings[:RECENT_COUNT]
+        bucket_of = {letter: name for name, letters in BUCKETS for letter in letters}
+        buckets: dict[str, list] = {name: [] for name, _ in BUCKETS}
+        buckets[OTHER_BUCKET] = []
+        for recording in sorted(recordings, key=_sort_key):
+            first = _sort_key(recording)[:1]
+            buckets[bucket_of.get(first, OTHER_BUCKET)].append(recording)
+        self.buckets = {name: tuple(items) for name, items in buckets.items() if items}
+
+    @property
+    def count(self) -> int:
+        """Return the number of recordings."""
+        return len(self.recordings)
+
+
+def _sort_key(recording: Any) -> str:
+    """Return the title folded to lowercase ascii for sorting and bucketing."""
+    return _fold(recording.title)
+
+
+def _fold(text: str | None) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    return text.encode("ascii", "ignore").decode().strip().casefold()
+
+
+def _tokens(text: str | None) -> list[str]:
+    """Return the words of a text, with s01e02 style words normalized."""
+    tokens = []
+    for word in _WORD.findall(_fold(text)):
+        if match := _SEASON_EPISODE.match(word):
+            season, episode, season_only, episode_only = match.groups()
+            if season is not None:
+                tokens.append(f"s{int(season)}e{int(episode)}")
+            elif season_only is not None:
+                tokens.append(f"s{int(season_only)}")
+            else:
+                tokens.append(f"e{int(episode_only)}")
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def _numbers_tokens(season: int | None, episode: int | None) -> list[str]:
+    tokens = []
+    if season is not None:
+        tokens.append(f"s{season}")
+    if episode is not None:
+        tokens.append(f"e{episode}")
+    if season is not None and episode is not None:
+        tokens.append(f"s{season}e{episode}")
+    return tokens
+
+
+class LGHorizonSearchResult(NamedTuple):
+    """A recording found by a search."""
+
+    title: str
+    media_content_type: str
+    media_content_id: str
+    show_id: str | None
+    season: int | None
+    episode: int | None
+    image: str | None
+    can_play: bool
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the result for a service response."""
+        return self._asdict()
+
+
+class LGHorizonRecordingsSearchIndex:
+    """Inverted index over the titles and numbers of the recordings.
+
+    The recordings list and the episodes of the shows are added as the
+    cache fetches them; only recordings that are new to the index are
+    tokenized. Every word of a query has to match the start of a word of a
+    result.
+    """
+
+    def __init__(self) -> None:
+        """Init the index."""
+        self._results: dict[str, LGHorizonSearchResult] = {}
+        self._postings: dict[str, set[str]] = {}
+        self._tokens: dict[str, tuple[str, ...]] = {}
+        self._folded: dict[str, str] = {}
+        self._show_episodes: dict[str, set[str]] = {}
+        self._listed: set[str] = set()
+        self._vocabulary: list[str] | None = None
+
+    def __len__(self) -> int:
+        """Return the number of indexed recordings."""
+        return len(self._results)
+
+    def update_recordings(self, recordings: Iterable[Any]) -> None:
+        """Index the recordings list, dropping what is no longer in it."""
+        listed = set()
+        for recording in recordings:
+            if type(recording) is LGHorizonRecordingListSeasonShow:
+                key = f"show:{recording.showId}"
+                result = LGHorizonSearchResult(
+                    recording.title,
+                    MEDIA_TYPE_TVSHOW,
+                    recording.showId,
+                    recording.showId,
+                    None,
+                    None,
+                    recording.image,
+                    False,
+                )
+                tokens = _tokens(recording.title)
+            elif type(recording) is LGHorizonRecordingSingle:
+                key = recording.id
+                result = LGHorizonSearchResult(
+                    recording.title,
+                    MEDIA_TYPE_EPISODE,
+                    recording.id,
+                    None,
+                    recording.seasonNumber,
+                    recording.episodeNumber,
+                    recording.image,
+                    True,
+                )
+                tokens = _tokens(recording.title) + _numbers_tokens(
+                    recording.seasonNumber, recording.episodeNumber
+                )
+            else:
+                continue
+            listed.add(key)
+            self._add(key, result, tokens)
+        for key in self._listed - listed:
+            self._remove(key)
+            if key.startswith("show:"):
+                for episode_key in self._show_episodes.pop(key[5:], ()):
+                    self._remove(episode_key)
+        self._listed = listed
+
+    def update_show(self, show_id: str, episodes: Iterable[Any]) -> None:
+        """Index the recorded episodes of a show."""
+        keys = set()
+        for episode in episodes:
+            if type(episode) is LGHorizonRecordingEpisode:
+                title = f"{episode.showTitle} - {episode.episodeTitle}"
+            elif type(episode) is LGHorizonRecordingShow:
+                title = episode.showTitle
+            else:
+                continue
+            key = f"episode:{episode.episodeId}"
+            keys.add(key)
+            self._add(
+                key,
+                LGHorizonSearchResult(
+                    title,
+                    MEDIA_TYPE_EPISODE,
+                    episode.episodeId,
+                    show_id,
+                    episode.seasonNumber,
+                    episode.episodeNumber,
+                    episode.image,
+                    episode.recordingState != "planned",
+                ),
+                _tokens(title)
+                + _numbers_tokens(episode.seasonNumber, episode.episodeNumber),
+            )
+        for key in self._show_episodes.get(show_id, set()) - keys:
+            self._remove(key)
+        self._show_episodes[show_id] = keys
+
+    def search(
+        self, query: str, limit: int = SEARCH_LIMIT
+    ) -> list[LGHorizonSearchResult]:
+        """Return the recordings that match every word of query."""
+        words = _tokens(query)
+        if not words:
+            return []
+        matches: set[str] | None = None
+        # The rarest words first, to keep the intersections small.
+        for keys in sorted((self._prefix_keys(word) for word in words), key=len):
+            matches = keys if matches is None else matches & keys
+            if not matches:
+                return []
+        folded = _fold(query)
+        ranked = sorted(
+            matches,
+            key=lambda key: (
+                not self._folded[key].startswith(folded),
+                self._results[key].media_content_type != MEDIA_TYPE_TVSHOW,
+                self._folded[key],
+                self._results[key].season or 0,
+                self._results[key].episode or 0,
+            ),
+        )
+        return [self._results[key] for key in ranked[:limit]]
+
+    def _prefix_keys(self, word: str) -> set[str]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        vocabulary = self._vocabulary
+        keys: set[str] = set()
+        position = bisect_left(vocabulary, word)
+        while position < len(vocabulary) and vocabulary[position].startswith(word):
+            keys |= self._postings[vocabulary[position]]
+            position += 1
+        return keys
+
+    def _add(self, key: str, result: LGHorizonSearchResult, tokens: list[str]) -> None:
+        if self._results.get(key) == result:
+            return
+        self._remove(key)
+        self._results[key] = result
+        self._folded[key] = _fold(result.title)
+        self._tokens[key] = tuple(set(tokens))
+        for token in self._tokens[key]:
+            if token not in self._postings:
+                self._postings[token] = set()
+                self._vocabulary = None
+            self._postings[token].add(key)
+
+    def _remove(self, key: str) -> None:
+        if self._results.pop(key, None) is None:
+            return
+        del self._folded[key]
+        for token in self._tokens.pop(key):
+            postings = self._postings[token]
+            postings.discard(key)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary = None
+
+
+@dataclass
+class _CacheEntry:
+    """A cached api result."""
+
+    data: Any
+    fetched: float
+    stale: bool = False
+
+
+class LGHorizonRecordingsCache:
+    """Cache get_recordings and get_recording_show results of one account.
+
+    Expired or invalidated entries are still served while a refresh runs in
+    the background, so the media browser never waits on the backend for
+    data it has seen before.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: LGHorizonApi,
+        ttl: timedelta = RECORDINGS_TTL,
+    ) -> None:
+        """Init the cache."""
+        self.hass = hass
+        self.api = api
+        self._ttl = ttl.total_seconds()
+        self._entries: dict[Any, _CacheEntry] = {}
+        self._refreshing: dict[Any, asyncio.Task] = {}
+        self._index: LGHorizonRecordingsIndex | None = None
+        self._index_source: list | None = None
+        self.search_index = LGHorizonRecordingsSearchIndex()
+        self._invalidate_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=INVALIDATE_COOLDOWN,
+            immediate=False,
+            function=self.async_invalidate,
+        )
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters."""
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "cached_shows": len(self._entries) - (RECORDINGS_KEY in self._entries),
+            "searchable": len(self.search_index),
+        }
+
+    async def async_get_recordings(self) -> list:
+        """Return the recordings of the account."""
+        return await self._async_get(RECORDINGS_KEY, self.api.get_recordings)
+
+    async def async_get_index(self) -> LGHorizonRecordingsIndex:
+        """Return the browse index of the current recordings."""
+        recordings = await self.async_get_recordings()
+        if self._index is None or self._index_source is not recordings:
+            self._index = LGHorizonRecordingsIndex(recordings)
+            self._index_source = recordings
+        return self._index
+
+    async def async_search(
+        self, query: str, limit: int = SEARCH_LIMIT
+    ) -> list[LGHorizonSearchResult]:
+        """Return the recordings matching query.
+
+        Episodes are indexed when their show is fetched. The shows matching
+        query that were never fetched are fetched first, at most
+        SEARCH_SHOWS_MAX of them, so their episodes are found as well.
+        """
+        await self.async_get_recordings()
+        # Shows are matched on the title words only, they have no numbers.
+        title = " ".join(
+            word for word in _tokens(query) if not _SEASON_EPISODE.match(word)
+        )
+        show_ids = [
+            result.show_id
+            for result in self.search_index.search(title, SEARCH_LIMIT)
+            if result.media_content_type == MEDIA_TYPE_TVSHOW
+            and ("show", result.show_id) not in self._entries
+        ][:SEARCH_SHOWS_MAX]
+        if show_ids:
+            await asyncio.gather(
+                *(self.async_get_show(show_id) for show_id in show_ids),
+                return_exceptions=True,
+            )
+        return self.search_index.search(query, limit)
+
+    async def async_get_show(self, show_id: str) -> list:
+        """Return the recorded episodes of a show."""
+        return await self._async_get(
+            ("show", show_id), self.api.get_recording_show, show_id
+        )
+
+    def handle_message(self, message: Any, topic: str) -> None:
+        """Invalidate the cache on recording activity, called from mqtt."""
+        if is_recording_activity(message, topic):
+            self.hass.loop.call_soon_threadsafe(self.async_schedule_invalidate)
+
+    @callback
+    def async_schedule_invalidate(self) -> None:
+        """Invalidate the cache once a burst of activity settled."""
+        self.hass.async_create_task(self._invalidate_debouncer.async_call())
+
+    @callback
+    def async_invalidate(self) -> None:
+        """Mark everything stale and refresh the recordings list."""
+        self.invalidations += 1
+        for entry in self._entries.values():
+            entry.stale = True
+        if RECORDINGS_KEY in self._entries:
+            self._async_refresh_in_background(RECORDINGS_KEY, self.api.get_recordings)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancel pending refreshes."""
+        self._invalidate_debouncer.async_cancel()
+        for task in self._refreshing.values():
+            task.cancel()
+
+    async def _async_get(self, key: Any, func: Callable, *args: Any) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return await self._async_refresh(key, func, *args)
+        if entry.stale or time.monotonic() - entry.fetched > self._ttl:
+            self.stale_hits += 1
+            self._async_refresh_in_background(key, func, *args)
+        else:
+            self.hits += 1
+        return entry.data
+
+    @callback
+    def _async_refresh(self, key: Any, func: Callable, *args: Any) -> asyncio.Task:
+        """Return the running refresh for key, or start one."""
+        task = self._refreshing.get(key)
+        if task is None:
+            task = self.hass.async_create_task(self._async_fetch(key, func, *args))
+            self._refreshing[key] = task
+        return task
+
+    @callback
+    def _async_refresh_in_background(
+        self, key: Any, func: Callable, *args: Any
+    ) -> None:
+        def log_failure(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception():
+                _LOGGER.warning("Unable to refresh %s: %s", key, task.exception())
+
+        self._async_refresh(key, func, *args).add_done_callback(log_failure)
+
+    async def _async_fetch(self, key: Any, func: Callable, *args: Any) -> Any:
+        try:
+            data = await self.hass.async_add_executor_job(func, *args)
+        finally:
+            self._refreshing.pop(key, None)
+        self._entries[key] = _CacheEntry(data, time.monotonic())
+        if key == RECORDINGS_KEY:
+            self.search_index.update_recordings(data)
+        else:
+            self.search_index.update_show(key[1], data)
+        return data
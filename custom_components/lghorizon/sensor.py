@@ -1,48 +1,135 @@
 """Support for interface with a LGHorizon Settopbox."""
 
-from homeassistant.components.sensor import SensorEntity
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_USERNAME
+from homeassistant.const import CONF_USERNAME, EntityCategory, UnitOfTime
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from .const import (
-    API,
+    CAPACITY_COORDINATOR,
     CONF_COUNTRY_CODE,
+    CONNECTION,
     COUNTRY_CODES,
-    DOMAIN
+    DOMAIN,
+    HISTORY,
+    METRICS,
 )
-from datetime import timedelta
+from .coordinator import LGHorizonCapacityCoordinator
+from .history import LGHorizonViewingHistory
+from .metrics import LGHorizonBoxMetrics
+from lghorizon import LGHorizonBox
 import logging
 
-SCAN_INTERVAL = timedelta(hours=1)
 _LOGGER = logging.getLogger(__name__)
 
-from lghorizon import LGHorizonApi
+# Only the debug sensors poll, they read counters that are kept anyway.
+SCAN_INTERVAL = timedelta(seconds=30)
+# Programmes listed in the attributes of the viewing history sensor.
+HISTORY_SENSOR_RECORDS = 10
+
+
+@dataclass(frozen=True, kw_only=True)
+class LGHorizonDebugSensorDescription(SensorEntityDescription):
+    """Describes a box metric sensor."""
+
+    value_fn: Callable[[LGHorizonBoxMetrics], float | int | None]
+
+
+DEBUG_SENSORS = (
+    LGHorizonDebugSensorDescription(
+        key="mqtt_message_rate",
+        name="MQTT messages",
+        icon="mdi:message-processing-outline",
+        native_unit_of_measurement="messages/min",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: metrics.mqtt_messages.current(),
+    ),
+    LGHorizonDebugSensorDescription(
+        key="coalesced_writes",
+        name="Coalesced state writes",
+        icon="mdi:content-save-minus-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.coalesced_writes,
+    ),
+    LGHorizonDebugSensorDescription(
+        key="command_latency",
+        name="Command latency",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: (
+            round(metrics.commands.last * 1000)
+            if metrics.commands.last is not None
+            else None
+        ),
+    ),
+)
 
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Setup platform"""
-    sensors = []
-    
+    metrics = hass.data[DOMAIN][entry.entry_id][METRICS]
+    connection = hass.data[DOMAIN][entry.entry_id][CONNECTION]
+    history = hass.data[DOMAIN][entry.entry_id][HISTORY]
+    box_ids = set()
+
+    @callback
+    def async_add_box_sensors():
+        """Add the sensors of boxes that have none yet."""
+        boxes = [
+            box for box in connection.boxes.values() if box.deviceId not in box_ids
+        ]
+        box_ids.update(box.deviceId for box in boxes)
+        async_add_entities(
+            LGHorizonDebugSensor(box, metrics.box(box.deviceId), description)
+            for box in boxes
+            for description in DEBUG_SENSORS
+        )
+        async_add_entities(LGHorizonHistorySensor(box, history) for box in boxes)
+
+    async_add_box_sensors()
+    # The snapshot the entry started from may miss boxes.
+    entry.async_on_unload(connection.async_add_listener(async_add_box_sensors))
+
     country = COUNTRY_CODES[entry.data[CONF_COUNTRY_CODE]][0:2]
     if country == "gb":
          _LOGGER.debug("Recording capacity feature not available in GB. No sensor added.")
          return
 
-    api: LGHorizonApi = hass.data[DOMAIN][entry.entry_id][API]
-    capacity = await hass.async_add_executor_job(api.get_recording_capacity)
-    if not capacity:
-        _LOGGER.info("No recording capacity available. No sensor added.")
-        return
+    coordinator: LGHorizonCapacityCoordinator = hass.data[DOMAIN][entry.entry_id][
+        CAPACITY_COORDINATOR
+    ]
 
     username = hass.data[DOMAIN][entry.entry_id][CONF_USERNAME]
-    sensors.append(LGHorizonSensor(hass, username, api))
-    async_add_entities(sensors, True)
+    # Added right away, it is unavailable until the capacity is known.
+    async_add_entities([LGHorizonSensor(hass, username, coordinator)])
+
+    @callback
+    def async_connected():
+        """Fetch the capacity in the background, unless a box pushed it."""
+        if coordinator.data is not None:
+            return
+        entry.async_create_background_task(
+            hass, coordinator.async_request_refresh(), "lghorizon recording capacity"
+        )
+
+    if connection.connected:
+        async_connected()
+    entry.async_on_unload(connection.async_add_listener(async_connected))
 
 
-class LGHorizonSensor(SensorEntity):
+class LGHorizonSensor(CoordinatorEntity[LGHorizonCapacityCoordinator], SensorEntity):
     """The LG Horizon Sensor."""
 
     username: str
@@ -67,18 +154,101 @@ class LGHorizonSensor(SensorEntity):
 
     @property
     def native_value(self):
-        return self.api.recording_capacity
+        return self.coordinator.data
+
+    @property
+    def available(self):
+        """Return True once the capacity is known."""
+        return super().available and self.coordinator.data is not None
 
     @property
     def state_class(self):
         return "total"
 
-    def __init__(self, hass: HomeAssistant, username: str, api: LGHorizonApi) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        username: str,
+        coordinator: LGHorizonCapacityCoordinator,
+    ) -> None:
         """Init the media player."""
-        self.api = api
+        super().__init__(coordinator)
         self.hass = hass
         self.username = username
 
-    async def async_update(self):
-        """Update the box."""
-        await self.hass.async_add_executor_job(self.api.get_recording_capacity)
+
+class LGHorizonDebugSensor(SensorEntity):
+    """Performance metric of a box, disabled by default."""
+
+    entity_description: LGHorizonDebugSensorDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_has_entity_name = True
+
+    def __init__(
+        self,
+        box: LGHorizonBox,
+        metrics: LGHorizonBoxMetrics,
+        description: LGHorizonDebugSensorDescription,
+    ) -> None:
+        """Init the sensor."""
+        self.entity_description = description
+        self._metrics = metrics
+        self._attr_unique_id = f"{box.deviceId}_{description.key}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, box.deviceId)},
+            "name": box.deviceFriendlyName,
+        }
+
+    @property
+    def native_value(self):
+        return self.entity_description.value_fn(self._metrics)
+
+
+class LGHorizonHistorySensor(SensorEntity):
+    """The programme a box showed last, with the ones before it."""
+
+    _attr_has_entity_name = True
+    _attr_name = "Viewing history"
+    _attr_icon = "mdi:history"
+    _attr_should_poll = False
+    # The history has a store of its own, the recorder keeps only the titles.
+    _unrecorded_attributes = frozenset(
+        {"time", "channel", "title", "play_mode", "recent"}
+    )
+
+    def __init__(self, box: LGHorizonBox, history: LGHorizonViewingHistory) -> None:
+        """Init the sensor."""
+        self._box_id = box.deviceId
+        self._history = history
+        self._attr_unique_id = f"{box.deviceId}_viewing_history"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, box.deviceId)},
+            "name": box.deviceFriendlyName,
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the history of the box."""
+        self.async_on_remove(
+            self._history.async_add_listener(self._box_id, self.async_write_ha_state)
+        )
+
+    @property
+    def native_value(self):
+        last = self._history.last(self._box_id)
+        return last.title if last else None
+
+    @property
+    def extra_state_attributes(self):
+        last = self._history.last(self._box_id)
+        if last is None:
+            return None
+        return {
+            **last.as_dict(),
+            "recent": [
+                record.as_dict()
+                for record in self._history.records(
+                    self._box_id, HISTORY_SENSOR_RECORDS
+                )
+            ],
+        }
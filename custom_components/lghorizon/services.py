@@ -0,0 +1,104 @@
+"""Services of the LG Horizon integration that are not bound to a box."""
+from __future__ import annotations
+
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+
+from .capture import CAPTURE_DEFAULT_DURATION, CAPTURE_MAX_DURATION
+from .const import (
+    CAPTURE,
+    CONF_CONFIG_ENTRY_ID,
+    CONF_DURATION,
+    DOMAIN,
+    START_CAPTURE,
+    START_PROFILING,
+    STOP_CAPTURE,
+    STOP_PROFILING,
+)
+from .profiling import (
+    PROFILE_DEFAULT_DURATION,
+    PROFILE_MAX_DURATION,
+    async_get_profiler,
+)
+
+ACCOUNT_SCHEMA = vol.Schema({vol.Optional(CONF_CONFIG_ENTRY_ID): cv.string})
+CAPTURE_SCHEMA = ACCOUNT_SCHEMA.extend(
+    {
+        vol.Optional(CONF_DURATION, default=CAPTURE_DEFAULT_DURATION): vol.All(
+            cv.time_period, vol.Range(max=CAPTURE_MAX_DURATION)
+        ),
+    }
+)
+PROFILING_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_DURATION, default=PROFILE_DEFAULT_DURATION): vol.All(
+            cv.time_period, vol.Range(max=PROFILE_MAX_DURATION)
+        ),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services that act on an account or the integration."""
+
+    async def async_start_capture(call: ServiceCall) -> None:
+        capture = _entry_data(hass, call)[CAPTURE]
+        await capture.async_start(call.data[CONF_DURATION])
+
+    async def async_stop_capture(call: ServiceCall) -> None:
+        await _entry_data(hass, call)[CAPTURE].async_stop()
+
+    hass.services.async_register(
+        DOMAIN, START_CAPTURE, async_start_capture, schema=CAPTURE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, STOP_CAPTURE, async_stop_capture, schema=ACCOUNT_SCHEMA
+    )
+
+    # The profiler covers the whole integration.
+    async def async_start_profiling(call: ServiceCall) -> None:
+        await async_get_profiler(hass).async_start(call.data[CONF_DURATION])
+
+    async def async_stop_profiling(call: ServiceCall) -> ServiceResponse:
+        return {"path": await async_get_profiler(hass).async_stop()}
+
+    hass.services.async_register(
+        DOMAIN, START_PROFILING, async_start_profiling, schema=PROFILING_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        STOP_PROFILING,
+        async_stop_profiling,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def _entry_data(hass: HomeAssistant, call: ServiceCall) -> dict[str, Any]:
+    """Return the data of the account a call is for.
+
+    The account may be left out when only one is set up.
+    """
+    entries = hass.data.get(DOMAIN, {})
+    entry_id = call.data.get(CONF_CONFIG_ENTRY_ID)
+    if entry_id is None:
+        if len(entries) != 1:
+            raise HomeAssistantError(
+                f"Select the account of {DOMAIN}.{call.service} with "
+                f"{CONF_CONFIG_ENTRY_ID}"
+            )
+        return next(iter(entries.values()))
+    if entry_id not in entries:
+        raise HomeAssistantError(f"Account {entry_id} is not loaded")
+    return entries[entry_id]
@@ -0,0 +1,158 @@
+"""What a LG Horizon box shows in Home Assistant at one moment."""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any
+
+from homeassistant.components.media_player import (
+    MediaPlayerEntityFeature,
+    MediaPlayerState,
+)
+from homeassistant.const import STATE_UNAVAILABLE
+
+from lghorizon import ONLINE_RUNNING, ONLINE_STANDBY, LGHorizonBox
+
+from .epg import LGHorizonEpgEvent
+from .position import LGHorizonPositionTracker
+from .thumbnails import artwork_key
+
+FEATURES_APP = (
+    MediaPlayerEntityFeature.PLAY
+    | MediaPlayerEntityFeature.PAUSE
+    | MediaPlayerEntityFeature.STOP
+    | MediaPlayerEntityFeature.TURN_ON
+    | MediaPlayerEntityFeature.TURN_OFF
+    | MediaPlayerEntityFeature.SELECT_SOURCE
+    | MediaPlayerEntityFeature.PLAY_MEDIA
+    | MediaPlayerEntityFeature.BROWSE_MEDIA
+    # | SUPPORT_SEEK
+)
+FEATURES_CHANNEL = (
+    FEATURES_APP
+    | MediaPlayerEntityFeature.NEXT_TRACK
+    | MediaPlayerEntityFeature.PREVIOUS_TRACK
+)
+
+
+def player_state(box: LGHorizonBox) -> str:
+    """Return the media player state of a box."""
+    if box.state == ONLINE_RUNNING:
+        if box.playing_info is not None and box.playing_info.paused:
+            return MediaPlayerState.PAUSED
+        return MediaPlayerState.PLAYING
+    if box.state == ONLINE_STANDBY:
+        return MediaPlayerState.OFF
+    return STATE_UNAVAILABLE
+
+
+class LGHorizonBoxSnapshot:
+    """Immutable state of a box, with the values of the entity worked out once.
+
+    Snapshots compare equal when everything the entity shows is the same, so
+    comparing the new snapshot with the last written one tells whether a
+    state write is needed. Attributes can not be set once the snapshot is
+    taken.
+    """
+
+    __slots__ = (
+        "state",
+        "available",
+        "source_type",
+        "channel_id",
+        "channel_title",
+        "title",
+        "image",
+        "duration",
+        "position",
+        "position_updated_at",
+        "recording_capacity",
+        "supported_features",
+        "artwork_identity",
+        "image_hash",
+        "attributes",
+        "_key",
+    )
+
+    def __init__(
+        self,
+        box: LGHorizonBox,
+        position: LGHorizonPositionTracker,
+        recording_capacity: int | None,
+        next_up: LGHorizonEpgEvent | None,
+    ) -> None:
+        """Take the snapshot."""
+        playing_info = box.playing_info
+        self.state: str = player_state(box)
+        self.available: bool = box.is_available()
+        self.source_type: str | None = playing_info.source_type
+        self.channel_id: str | None = playing_info.channel_id
+        self.channel_title: str | None = playing_info.channel_title
+        self.title: str | None = playing_info.title
+        self.image: str | None = playing_info.image
+        self.duration: int | None = (
+            int(playing_info.duration) if playing_info.duration else None
+        )
+        self.position: int | None = (
+            int(position.position) if position.position is not None else None
+        )
+        self.position_updated_at: datetime | None = position.updated_at
+        self.recording_capacity = recording_capacity
+        self.supported_features = (
+            FEATURES_APP if self.source_type == "app" else FEATURES_CHANNEL
+        )
+        if self.source_type == "linear":
+            # The stream image of a channel keeps its url for every programme.
+            self.artwork_identity = f"{self.image}|{self.channel_id}|{self.title}"
+        else:
+            self.artwork_identity = self.image
+        self.image_hash: str | None = (
+            artwork_key(self.artwork_identity)[:16] if self.image is not None else None
+        )
+        attributes: dict[str, Any] = {
+            "play_mode": self.source_type,
+            "channel": self.channel_title,
+            "title": self.title,
+            "image": self.image,
+            "recording_capacity": recording_capacity,
+        }
+        if next_up is not None and self.source_type == "linear":
+            attributes["next_title"] = next_up.title
+            attributes["next_start"] = next_up.start_time
+        self.attributes: Mapping[str, Any] = MappingProxyType(attributes)
+        self._key = (
+            self.state,
+            self.available,
+            self.source_type,
+            self.channel_id,
+            self.channel_title,
+            self.title,
+            self.image,
+            self.duration,
+            self.position,
+            self.position_updated_at,
+            self.recording_capacity,
+            attributes.get("next_title"),
+            attributes.get("next_start"),
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Set an attribute while the snapshot is taken, _key is set last."""
+        if hasattr(self, "_key"):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str) -> None:
+        """Refuse to delete attributes."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other: object) -> bool:
+        """Return True if other shows the same."""
+        if not isinstance(other, LGHorizonBoxSnapshot):
+            return NotImplemented
+        return self._key == other._key
+
+    def __hash__(self) -> int:
+        """Hash what the snapshot shows."""
+        return hash(self._key)
@@ -0,0 +1,85 @@
+"""Persisted snapshot of the boxes and channels of a LG Horizon account."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from lghorizon import LGHorizonApi, LGHorizonBox
+
+from .channels import LGHorizonChannelIndex, LGHorizonChannelInfo
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+
+
+class LGHorizonSnapshotStore:
+    """Stores what is needed to create the entities before connecting."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Init the store."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}"
+        )
+        self._data: dict[str, Any] | None = None
+
+    async def async_load(self) -> dict[str, Any] | None:
+        """Load the last snapshot."""
+        self._data = await self._store.async_load()
+        return self._data
+
+    async def async_save(self, api: LGHorizonApi, index: LGHorizonChannelIndex) -> None:
+        """Save the boxes and channels of a connected api, if they changed."""
+        data = snapshot_data(api, index)
+        if data != self._data:
+            self._data = data
+            await self._store.async_save(data)
+
+    async def async_remove(self) -> None:
+        """Remove the snapshot."""
+        await self._store.async_remove()
+
+
+def snapshot_data(api: LGHorizonApi, index: LGHorizonChannelIndex) -> dict[str, Any]:
+    """Return the snapshot of the boxes and channels of an api."""
+    return {
+        "boxes": [
+            {
+                "deviceId": box.deviceId,
+                "hashedCPEId": box.hashedCPEId,
+                "deviceFriendlyName": box.deviceFriendlyName,
+                "manufacturer": box.manufacturer,
+                "model": box.model,
+            }
+            for box in api.settop_boxes.values()
+        ],
+        "channels": [list(channel) for channel in index.channels],
+    }
+
+
+def boxes_from_snapshot(data: dict[str, Any]) -> dict[str, LGHorizonBox]:
+    """Return unconnected boxes for the boxes in a snapshot."""
+    boxes = {}
+    for stored_box in data["boxes"]:
+        platform_type = None
+        if stored_box["manufacturer"] or stored_box["model"]:
+            platform_type = {
+                "manufacturer": stored_box["manufacturer"],
+                "model": stored_box["model"],
+            }
+        box_json = {
+            "deviceId": stored_box["deviceId"],
+            "hashedCPEId": stored_box["hashedCPEId"],
+            "settings": {"deviceFriendlyName": stored_box["deviceFriendlyName"]},
+        }
+        box = LGHorizonBox(box_json, platform_type, None, None, {})
+        boxes[box.deviceId] = box
+    return boxes
+
+
+def channels_from_snapshot(data: dict[str, Any]) -> LGHorizonChannelIndex:
+    """Return the channel index stored in a snapshot."""
+    return LGHorizonChannelIndex(
+        LGHorizonChannelInfo(*channel) for channel in data["channels"]
+    )
@@ -0,0 +1,321 @@
+"""On-disk cache of LG Horizon artwork."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import hashlib
+from io import BytesIO
+import logging
+import mimetypes
+import os
+
+import aiohttp
+from aiohttp import hdrs
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, images are cached as is without it
+    Image = None
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_THUMBNAIL_CACHE = "lghorizon_thumbnail_cache"
+THUMBNAIL_DIR = ".lghorizon_thumbnails"
+THUMBNAIL_MAX_BYTES = 50 * 1024 * 1024
+# Artwork is shrunk to fit dashboard tiles when Pillow is available.
+THUMBNAIL_TILE_SIZE = (640, 640)
+FETCH_TIMEOUT = 10
+# Validators of the cached artwork, for conditional requests.
+VALIDATORS_STORAGE_KEY = "lghorizon.thumbnails"
+VALIDATORS_STORAGE_VERSION = 1
+VALIDATORS_SAVE_DELAY = 60
+# Urls handed to the media browser that can be fetched by their key.
+REGISTERED_URLS_MAX = 5000
+
+_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+
+async def async_get_thumbnail_cache(hass: HomeAssistant) -> LGHorizonThumbnailCache:
+    """Return the thumbnail cache shared by all entries."""
+    if DATA_THUMBNAIL_CACHE not in hass.data:
+        cache = LGHorizonThumbnailCache(hass, hass.config.path(THUMBNAIL_DIR))
+        hass.data[DATA_THUMBNAIL_CACHE] = cache
+        await cache.async_load()
+    return hass.data[DATA_THUMBNAIL_CACHE]
+
+
+def artwork_key(identity: str) -> str:
+    """Return the cache key of an artwork identity."""
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+class LGHorizonThumbnailCache:
+    """Size bounded LRU cache of artwork, keyed by what the artwork shows.
+
+    The identity passed by the caller decides when artwork is fetched again,
+    not the url: the stream image of a channel keeps its url while the
+    programme on it changes.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, path: str, max_bytes: int = THUMBNAIL_MAX_BYTES
+    ) -> None:
+        """Init the cache."""
+        self.hass = hass
+        self.path = path
+        self.max_bytes = max_bytes
+        self._files: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self._size = 0
+        self._fetching: dict[str, asyncio.Task] = {}
+        self._validators: dict[str, tuple[str | None, str | None]] = {}
+        self._validators_store: Store[dict[str, list]] = Store(
+            hass, VALIDATORS_STORAGE_VERSION, VALIDATORS_STORAGE_KEY
+        )
+        self._urls: OrderedDict[str, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self.not_modified = 0
+
+    @property
+    def size(self) -> int:
+        """Return the bytes on disk."""
+        return self._size
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the counters for diagnostics."""
+        return {
+            "files": len(self._files),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "downloads": self.downloads,
+            "not_modified": self.not_modified,
+        }
+
+    async def async_load(self) -> None:
+        """Index the files that are already on disk."""
+        files = await self.hass.async_add_executor_job(self._scan)
+        for key, filename, size in files:
+            self._files[key] = (filename, size)
+            self._size += size
+        validators = await self._validators_store.async_load() or {}
+        for key, (etag, last_modified) in validators.items():
+            if key in self._files:
+                self._validators[key] = (etag, last_modified)
+
+    @callback
+    def async_register(self, url: str) -> str:
+        """Return the key under which the artwork at url can be fetched."""
+        key = artwork_key(url)
+        self._urls[key] = url
+        self._urls.move_to_end(key)
+        if len(self._urls) > REGISTERED_URLS_MAX:
+            self._urls.popitem(last=False)
+        return key
+
+    async def async_get_registered(self, key: str) -> tuple[bytes | None, str | None]:
+        """Return the artwork of a key handed out by async_register."""
+        if key in self._urls:
+            return await self.async_get_image(self._urls[key], self._urls[key])
+        if key in self._files:
+            # Registered before a restart, only what is on disk is served.
+            content = await self.hass.async_add_executor_job(
+                self._read, self._files[key][0]
+            )
+            if content is not None:
+                self.hits += 1
+                return content, mimetypes.guess_type(self._files[key][0])[0]
+        return None, None
+
+    async def async_prefetch(self, identity: str, url: str) -> bool:
+        """Fetch artwork before it is shown, return True if it is on disk.
+
+        Artwork already on disk is requested again with its validators, the
+        backend only sends it when it changed.
+        """
+        key = artwork_key(identity)
+        if key in self._files and key not in self._validators:
+            return True
+        task = self._fetching.get(key)
+        if task is None:
+            task = self.hass.async_create_task(
+                self._async_fetch(key, url, read_unchanged=False)
+            )
+            self._fetching[key] = task
+        content, _content_type = await task
+        return content is not None
+
+    def _scan(self) -> list[tuple[str, str, int]]:
+        os.makedirs(self.path, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.is_file():
+                stat = entry.stat()
+                key = os.path.splitext(entry.name)[0]
+                files.append((stat.st_mtime, key, entry.name, stat.st_size))
+        newest: dict[str, tuple[str, int]] = {}
+        for _, key, filename, size in sorted(files):
+            if key in newest:
+                # An older copy of the artwork in another format.
+                self._remove([newest.pop(key)[0]])
+            newest[key] = (filename, size)
+        return [(key, filename, size) for key, (filename, size) in newest.items()]
+
+    async def async_get_image(
+        self, identity: str, url: str
+    ) -> tuple[bytes | None, str | None]:
+        """Return the artwork for identity, fetching it from url when needed."""
+        key = artwork_key(identity)
+        if key in self._files:
+            self._files.move_to_end(key)
+            filename = self._files[key][0]
+            content = await self.hass.async_add_executor_job(self._read, filename)
+            if content is not None:
+                self.hits += 1
+                return content, mimetypes.guess_type(filename)[0]
+            self._forget(key)
+
+        self.misses += 1
+        task = self._fetching.get(key)
+        if task is None:
+            task = self.hass.async_create_task(self._async_fetch(key, url))
+            self._fetching[key] = task
+        return await task
+
+    async def _async_fetch(
+        self, key: str, url: str, read_unchanged: bool = True
+    ) -> tuple[bytes | None, str | None]:
+        """Fetch artwork, revalidating the file on disk.
+
+        Without read_unchanged, artwork that did not change is not read back
+        from disk and its content is returned as empty bytes.
+        """
+        headers = {}
+        etag, last_modified = self._validators.get(key, (None, None))
+        if key in self._files:
+            if etag:
+                headers[hdrs.IF_NONE_MATCH] = etag
+            if last_modified:
+                headers[hdrs.IF_MODIFIED_SINCE] = last_modified
+        try:
+            session = async_get_clientsession(self.hass)
+            async with session.get(
+                url, headers=headers, timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+            ) as response:
+                if headers and response.status == 304:
+                    content = None
+                else:
+                    response.raise_for_status()
+                    content = await response.read()
+                    content_type = response.content_type
+                    etag = response.headers.get(hdrs.ETAG)
+                    last_modified = response.headers.get(hdrs.LAST_MODIFIED)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            _LOGGER.debug("Unable to fetch artwork %s: %s", url, ex)
+            self._fetching.pop(key, None)
+            return None, None
+
+        if content is None:
+            self.not_modified += 1
+            self._fetching.pop(key, None)
+            if key not in self._files:
+                # Evicted while it was requested.
+                return None, None
+            self._files.move_to_end(key)
+            filename = self._files[key][0]
+            if not read_unchanged:
+                return b"", mimetypes.guess_type(filename)[0]
+            content = await self.hass.async_add_executor_job(self._read, filename)
+            return content, mimetypes.guess_type(filename)[0]
+
+        self.downloads += 1
+        previous = self._files.get(key)
+        try:
+            filename = key + _EXTENSIONS.get(content_type, "")
+            content = await self.hass.async_add_executor_job(
+                self._write, filename, content
+            )
+            self._forget(key)
+            self._files[key] = (filename, len(content))
+            self._size += len(content)
+            if etag or last_modified:
+                self._validators[key] = (etag, last_modified)
+                self._async_save_validators()
+        finally:
+            self._fetching.pop(key, None)
+        if previous is not None and previous[0] != filename:
+            # The artwork changed format, the old file is no longer indexed.
+            await self.hass.async_add_executor_job(self._remove, [previous[0]])
+        await self._async_evict()
+        return content, content_type
+
+    async def _async_evict(self) -> None:
+        """Remove the least recently used files until the cache fits."""
+        evicted = []
+        while self._size > self.max_bytes and len(self._files) > 1:
+            key, (filename, size) = self._files.popitem(last=False)
+            self._size -= size
+            self._validators.pop(key, None)
+            evicted.append(filename)
+        if evicted:
+            self._async_save_validators()
+            await self.hass.async_add_executor_job(self._remove, evicted)
+
+    def _forget(self, key: str) -> None:
+        if key in self._files:
+            self._size -= self._files.pop(key)[1]
+        if self._validators.pop(key, None) is not None:
+            self._async_save_validators()
+
+    @callback
+    def _async_save_validators(self) -> None:
+        self._validators_store.async_delay_save(
+            lambda: {key: list(value) for key, value in self._validators.items()},
+            VALIDATORS_SAVE_DELAY,
+        )
+
+    def _read(self, filename: str) -> bytes | None:
+        try:
+            with open(os.path.join(self.path, filename), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _write(self, filename: str, content: bytes) -> bytes:
+        content = _resize(content)
+        with open(os.path.join(self.path, filename), "wb") as file:
+            file.write(content)
+        return content
+
+    def _remove(self, filenames: list[str]) -> None:
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(self.path, filename))
+            except OSError:
+                pass
+
+
+def _resize(content: bytes) -> bytes:
+    """Shrink artwork larger than a dashboard tile, keeping its format."""
+    if Image is None:
+        return content
+    try:
+        with Image.open(BytesIO(content)) as image:
+            if (
+                image.width <= THUMBNAIL_TILE_SIZE[0]
+                and image.height <= THUMBNAIL_TILE_SIZE[1]
+            ):
+                return content
+            image_format = image.format
+            image.thumbnail(THUMBNAIL_TILE_SIZE)
+            output = BytesIO()
+            image.save(output, format=image_format)
+            return output.getvalue()
+    except Exception:  # pylint: disable=broad-except
+        return content
@@ -0,0 +1,143 @@
+"""Prefetch of the artwork of a LG Horizon account."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .channels import LGHorizonChannelCatalogue
+from .recordings import LGHorizonRecordingsCache
+from .thumbnails import LGHorizonThumbnailCache
+
+_LOGGER = logging.getLogger(__name__)
+
+# Time after connecting before the warm-up starts, startup is busy enough.
+WARMUP_DELAY = timedelta(minutes=2)
+WARMUP_INTERVAL = timedelta(hours=24)
+WARMUP_CONCURRENCY = 4
+# The warm-up stops when the cache is this full, to keep what was viewed.
+WARMUP_MAX_FILL = 0.8
+
+
+class LGHorizonArtworkWarmup:
+    """Fetches channel logos and recording artwork into the thumbnail cache.
+
+    Runs a while after the first connect and then once a day, a few requests
+    at a time. Artwork that is already cached is revalidated with a conditional
+    request, so an unchanged image is not downloaded again.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        channels: LGHorizonChannelCatalogue,
+        recordings_cache: LGHorizonRecordingsCache,
+        thumbnails: LGHorizonThumbnailCache,
+        name: str,
+    ) -> None:
+        """Init the warm-up."""
+        self.hass = hass
+        self.channels = channels
+        self.recordings_cache = recordings_cache
+        self.thumbnails = thumbnails
+        self.name = name
+        self._unsub: CALLBACK_TYPE | None = None
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.last_artwork = 0
+        self.last_failed = 0
+        self.last_skipped = 0
+        self.last_duration: float | None = None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return the state of the warm-up for diagnostics."""
+        return {
+            "runs": self.runs,
+            "artwork": self.last_artwork,
+            "failed": self.last_failed,
+            "skipped": self.last_skipped,
+            "duration_s": self.last_duration,
+        }
+
+    @callback
+    def async_connected(self) -> None:
+        """Schedule the first run, a reconnect keeps the daily schedule."""
+        if self._unsub is None and (self._task is None or self._task.done()):
+            self.async_schedule()
+
+    @callback
+    def async_schedule(self, delay: timedelta = WARMUP_DELAY) -> None:
+        """Run the warm-up after delay, unless it is running."""
+        if self._unsub:
+            self._unsub()
+        self._unsub = async_call_later(self.hass, delay, self._async_start)
+
+    @callback
+    def _async_start(self, _now: datetime) -> None:
+        self._unsub = None
+        if self._task is not None and not self._task.done():
+            return
+        self._task = self.hass.async_create_background_task(
+            self.async_run(), f"lghorizon artwork warm-up {self.name}"
+        )
+
+    async def async_run(self) -> None:
+        """Fetch the artwork of the channels and recordings."""
+        start = time.monotonic()
+        urls = dict.fromkeys(
+            channel.logo_image
+            for channel in self.channels.index.channels
+            if channel.logo_image
+        )
+        try:
+            index = await self.recordings_cache.async_get_index()
+        except Exception as ex:  # pylint: disable=broad-except
+            _LOGGER.debug("No recordings to warm up for %s: %s", self.name, ex)
+        else:
+            urls.update(
+                dict.fromkeys(
+                    recording.image for recording in index.recordings if recording.image
+                )
+            )
+
+        semaphore = asyncio.Semaphore(WARMUP_CONCURRENCY)
+        max_size = self.thumbnails.max_bytes * WARMUP_MAX_FILL
+
+        async def warm(url: str) -> bool | None:
+            async with semaphore:
+                if self.thumbnails.size >= max_size:
+                    # Skipped, the cache is full enough.
+                    return None
+                return await self.thumbnails.async_prefetch(url, url)
+
+        results = await asyncio.gather(*(warm(url) for url in urls))
+        self.runs += 1
+        self.last_artwork = len(results)
+        self.last_failed = results.count(False)
+        self.last_skipped = results.count(None)
+        self.last_duration = round(time.monotonic() - start, 1)
+        _LOGGER.debug(
+            "Warmed up %s artwork of %s in %.1fs, %s failed, %s skipped",
+            self.last_artwork,
+            self.name,
+            self.last_duration,
+            self.last_failed,
+            self.last_skipped,
+        )
+        self.async_schedule(WARMUP_INTERVAL)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop the warm-up."""
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
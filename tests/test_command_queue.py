@@ -0,0 +1,154 @@
+"""Tests for the box command queue."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import threading
+from typing import Any
+
+import pytest
+
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.lghorizon.command_queue import (
+    SUPERSEDE_PLAYBACK,
+    SUPERSEDE_ZAP,
+    LGHorizonCommandQueue,
+)
+
+
+class _Hass:
+    """The parts of Home Assistant the queue uses."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.get_running_loop()
+
+    def async_create_task(self, target: Any) -> asyncio.Task:
+        return self.loop.create_task(target)
+
+    def async_add_executor_job(self, func: Callable, *args: Any) -> asyncio.Future:
+        return self.loop.run_in_executor(None, func, *args)
+
+
+class _Box:
+    """Records the commands sent, blocking while the gate is closed."""
+
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def set_channel(self, channel: str) -> None:
+        self.gate.wait()
+        self.sent.append(channel)
+
+    def next_channel(self) -> None:
+        self.gate.wait()
+        self.sent.append("next")
+
+    def previous_channel(self) -> None:
+        self.gate.wait()
+        self.sent.append("previous")
+
+    def play(self) -> None:
+        self.gate.wait()
+        self.sent.append("play")
+
+    def pause(self) -> None:
+        self.gate.wait()
+        self.sent.append("pause")
+
+
+def _run(test: Callable[[LGHorizonCommandQueue, _Box], Any]) -> None:
+    async def run() -> None:
+        await test(LGHorizonCommandQueue(_Hass(), "box"), _Box())
+
+    asyncio.run(run())
+
+
+def test_commands_run_in_order() -> None:
+    """Commands without a supersede key are all sent, in order."""
+
+    async def test(queue: LGHorizonCommandQueue, box: _Box) -> None:
+        futures = [
+            queue.async_enqueue(box.next_channel),
+            queue.async_enqueue(box.play),
+            queue.async_enqueue(box.previous_channel),
+        ]
+        await asyncio.gather(*futures)
+        assert box.sent == ["next", "play", "previous"]
+
+    _run(test)
+
+
+def test_absolute_zaps_supersede_each_other() -> None:
+    """Only the last of the pending zaps to a channel is sent."""
+
+    async def test(queue: LGHorizonCommandQueue, box: _Box) -> None:
+        box.gate.clear()
+        running = queue.async_enqueue(box.play, supersede=SUPERSEDE_PLAYBACK)
+        await asyncio.sleep(0.05)
+        futures = [
+            queue.async_enqueue(box.set_channel, "A", supersede=SUPERSEDE_ZAP),
+            queue.async_enqueue(box.set_channel, "B", supersede=SUPERSEDE_ZAP),
+            queue.async_enqueue(box.set_channel, "C", supersede=SUPERSEDE_ZAP),
+        ]
+        # Superseded commands resolve without being sent.
+        assert futures[0].done() and futures[1].done()
+        box.gate.set()
+        await asyncio.gather(running, *futures)
+        assert box.sent == ["play", "C"]
+
+    _run(test)
+
+
+def test_relative_zaps_are_not_superseded() -> None:
+    """Next and previous steps are all sent, around the absolute zaps."""
+
+    async def test(queue: LGHorizonCommandQueue, box: _Box) -> None:
+        box.gate.clear()
+        futures = [
+            queue.async_enqueue(box.pause, supersede=SUPERSEDE_PLAYBACK),
+            queue.async_enqueue(box.next_channel),
+            queue.async_enqueue(box.next_channel),
+            queue.async_enqueue(box.set_channel, "A", supersede=SUPERSEDE_ZAP),
+            queue.async_enqueue(box.previous_channel),
+        ]
+        box.gate.set()
+        await asyncio.gather(*futures)
+        assert box.sent == ["pause", "next", "next", "A", "previous"]
+
+    _run(test)
+
+
+def test_clear_fails_pending_commands() -> None:
+    """Clearing the queue fails the waiting callers with a HomeAssistantError."""
+
+    async def test(queue: LGHorizonCommandQueue, box: _Box) -> None:
+        box.gate.clear()
+        running = queue.async_enqueue(box.next_channel)
+        pending = queue.async_enqueue(box.set_channel, "A", supersede=SUPERSEDE_ZAP)
+        await asyncio.sleep(0.05)
+        queue.async_clear()
+        box.gate.set()
+        for future in (running, pending):
+            with pytest.raises(HomeAssistantError):
+                await future
+        assert "A" not in box.sent
+
+    _run(test)
+
+
+def test_failure_reaches_the_caller() -> None:
+    """An exception of the api is raised to the caller of the command."""
+
+    async def test(queue: LGHorizonCommandQueue, box: _Box) -> None:
+        def fail() -> None:
+            raise ValueError("box offline")
+
+        with pytest.raises(ValueError):
+            await queue.async_send(fail)
+        await queue.async_send(box.play)
+        assert box.sent == ["play"]
+
+    _run(test)
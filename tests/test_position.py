@@ -0,0 +1,68 @@
+"""Tests for the playback position tracker."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from custom_components.lghorizon.position import (
+    POSITION_TOLERANCE,
+    LGHorizonPositionTracker,
+)
+
+START = datetime(2024, 1, 1, 20, 0, tzinfo=timezone.utc)
+
+
+def test_first_report_is_taken() -> None:
+    """The first position reported is taken over."""
+    tracker = LGHorizonPositionTracker()
+    assert tracker.update(100, START, False)
+    assert tracker.position == 100
+    assert tracker.updated_at == START
+
+
+def test_drift_within_tolerance_is_ignored() -> None:
+    """A report that matches the extrapolated position is not taken over."""
+    tracker = LGHorizonPositionTracker()
+    tracker.update(100, START, False)
+    later = START + timedelta(seconds=30)
+    assert not tracker.update(130 + POSITION_TOLERANCE, later, False)
+    assert not tracker.update(130 - POSITION_TOLERANCE, later, False)
+    assert tracker.position == 100
+    assert tracker.updated_at == START
+
+
+def test_seek_is_taken() -> None:
+    """A report beyond the tolerance counts as a seek."""
+    tracker = LGHorizonPositionTracker()
+    tracker.update(100, START, False)
+    later = START + timedelta(seconds=30)
+    assert tracker.update(400, later, False)
+    assert tracker.position == 400
+    assert tracker.updated_at == later
+
+
+def test_paused_position_does_not_move() -> None:
+    """While paused the position is not extrapolated."""
+    tracker = LGHorizonPositionTracker()
+    tracker.update(100, START, True)
+    later = START + timedelta(seconds=30)
+    assert not tracker.update(100, later, True)
+    assert tracker.update(130, later, True)
+
+
+def test_pause_and_resume_are_taken() -> None:
+    """A change of the paused state is always taken over."""
+    tracker = LGHorizonPositionTracker()
+    tracker.update(100, START, False)
+    assert tracker.update(100, START, True)
+    assert tracker.paused
+    assert tracker.update(100, START, False)
+    assert not tracker.paused
+
+
+def test_cleared_position() -> None:
+    """A missing position clears the tracker once."""
+    tracker = LGHorizonPositionTracker()
+    tracker.update(100, START, False)
+    assert tracker.update(None, None, False)
+    assert tracker.position is None
+    assert not tracker.update(None, None, False)
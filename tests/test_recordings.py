@@ -0,0 +1,142 @@
+"""Tests for the recordings browse and search indexes."""
+from __future__ import annotations
+
+from lghorizon import (
+    LGHorizonRecordingEpisode,
+    LGHorizonRecordingListSeasonShow,
+    LGHorizonRecordingSingle,
+)
+
+from custom_components.lghorizon.recordings import (
+    OTHER_BUCKET,
+    LGHorizonRecordingsIndex,
+    LGHorizonRecordingsSearchIndex,
+)
+
+
+def _single(
+    recording_id: str,
+    title: str,
+    season: int | None = None,
+    episode: int | None = None,
+) -> LGHorizonRecordingSingle:
+    recording_json = {
+        "id": recording_id,
+        "title": title,
+        "channelId": "NL_000001_019401",
+        "type": "single",
+    }
+    if season is not None:
+        recording_json["seasonNumber"] = season
+    if episode is not None:
+        recording_json["episodeNumber"] = episode
+    return LGHorizonRecordingSingle(recording_json)
+
+
+def _show(show_id: str, title: str) -> LGHorizonRecordingListSeasonShow:
+    return LGHorizonRecordingListSeasonShow(
+        {
+            "id": show_id,
+            "title": title,
+            "poster": {"url": f"https://example.com/{show_id}.jpg"},
+            "channelId": "NL_000001_019401",
+            "type": "show",
+        }
+    )
+
+
+def _episode(
+    episode_id: str, show_title: str, title: str, season: int, episode: int
+) -> LGHorizonRecordingEpisode:
+    return LGHorizonRecordingEpisode(
+        {
+            "episodeId": episode_id,
+            "episodeTitle": title,
+            "showTitle": show_title,
+            "recordingState": "recorded",
+            "seasonNumber": season,
+            "episodeNumber": episode,
+        }
+    )
+
+
+def test_buckets() -> None:
+    """Recordings are sorted into buckets by the folded first letter."""
+    index = LGHorizonRecordingsIndex(
+        [
+            _single("1", "Zomergasten"),
+            _single("2", "Één tegen 100"),
+            _single("3", "boer zoekt vrouw"),
+            _single("4", "24"),
+        ]
+    )
+    assert index.count == 4
+    assert [r.title for r in index.buckets["A-F"]] == [
+        "boer zoekt vrouw",
+        "Één tegen 100",
+    ]
+    assert [r.title for r in index.buckets["S-Z"]] == ["Zomergasten"]
+    assert [r.title for r in index.buckets[OTHER_BUCKET]] == ["24"]
+    # Empty buckets are left out.
+    assert "G-L" not in index.buckets
+    # The recordings list holds the newest first.
+    assert index.recent[0].title == "Zomergasten"
+
+
+def test_search_matches_word_prefixes() -> None:
+    """Every word of a query has to start a word of the title."""
+    index = LGHorizonRecordingsSearchIndex()
+    index.update_recordings(
+        [_single("1", "De Slimste Mens"), _single("2", "Slimme Dieren")]
+    )
+    assert [r.title for r in index.search("slim")] == [
+        "Slimme Dieren",
+        "De Slimste Mens",
+    ]
+    assert [r.title for r in index.search("slim mens")] == ["De Slimste Mens"]
+    assert index.search("mens dieren") == []
+    assert index.search("") == []
+
+
+def test_search_folds_accents_and_case() -> None:
+    """Queries match regardless of accents and case."""
+    index = LGHorizonRecordingsSearchIndex()
+    index.update_recordings([_single("1", "Één tegen 100")])
+    assert [r.media_content_id for r in index.search("EEN")] == ["1"]
+
+
+def test_search_season_and_episode() -> None:
+    """Season and episode numbers are searchable in s01e02 style."""
+    index = LGHorizonRecordingsSearchIndex()
+    index.update_recordings(
+        [_single("1", "Flikken", 1, 2), _single("2", "Flikken", 1, 3)]
+    )
+    assert [r.media_content_id for r in index.search("flikken s01e02")] == ["1"]
+    assert [r.media_content_id for r in index.search("flikken s1")] == ["1", "2"]
+
+
+def test_show_episodes_follow_the_show() -> None:
+    """Episodes of a show are found, and dropped with the show."""
+    index = LGHorizonRecordingsSearchIndex()
+    index.update_recordings([_show("show1", "Wie is de Mol?")])
+    index.update_show(
+        "show1",
+        [
+            _episode("ep1", "Wie is de Mol?", "Aflevering 1", 24, 1),
+            _episode("ep2", "Wie is de Mol?", "Aflevering 2", 24, 2),
+        ],
+    )
+    assert len(index) == 3
+    results = index.search("mol")
+    # The show ranks before its episodes.
+    assert results[0].media_content_id == "show1"
+    assert [r.media_content_id for r in index.search("mol e2")] == ["ep2"]
+
+    index.update_show(
+        "show1", [_episode("ep1", "Wie is de Mol?", "Aflevering 1", 24, 1)]
+    )
+    assert [r.media_content_id for r in index.search("aflevering")] == ["ep1"]
+
+    index.update_recordings([])
+    assert len(index) == 0
+    assert index.search("mol") == []
@@ -0,0 +1,99 @@
+"""Tests for the box snapshots."""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from lghorizon import ONLINE_RUNNING, LGHorizonBox
+
+from custom_components.lghorizon.position import LGHorizonPositionTracker
+from custom_components.lghorizon.snapshot import LGHorizonBoxSnapshot
+from custom_components.lghorizon.storage import boxes_from_snapshot
+
+BOX_ID = "3C36E4-EOSSTB-00000001"
+
+
+def _box() -> LGHorizonBox:
+    box = boxes_from_snapshot(
+        {
+            "boxes": [
+                {
+                    "deviceId": BOX_ID,
+                    "hashedCPEId": "hashed",
+                    "deviceFriendlyName": "Living room",
+                    "manufacturer": None,
+                    "model": None,
+                }
+            ]
+        }
+    )[BOX_ID]
+    box.state = ONLINE_RUNNING
+    box.playing_info.set_source_type("linear")
+    box.playing_info.set_channel("NL_000001_019401")
+    box.playing_info.set_channel_title("NPO 1")
+    box.playing_info.set_title("Journaal")
+    box.playing_info.set_image("https://example.com/npo1.jpg")
+    return box
+
+
+def _snapshot(box: LGHorizonBox, capacity: int | None = 10) -> LGHorizonBoxSnapshot:
+    return LGHorizonBoxSnapshot(box, LGHorizonPositionTracker(), capacity, None)
+
+
+def test_equal_when_nothing_shown_changed() -> None:
+    """Two snapshots of an unchanged box are equal and hash alike."""
+    box = _box()
+    first, second = _snapshot(box), _snapshot(box)
+    assert first is not second
+    assert first == second
+    assert hash(first) == hash(second)
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda box: box.playing_info.set_title("Nieuwsuur"),
+        lambda box: box.playing_info.set_channel_title("NPO 2"),
+        lambda box: box.playing_info.set_paused(True),
+        lambda box: box.playing_info.set_duration(1800),
+    ],
+)
+def test_not_equal_when_shown_changed(change) -> None:
+    """A change of what the entity shows makes the snapshots differ."""
+    box = _box()
+    before = _snapshot(box)
+    change(box)
+    assert _snapshot(box) != before
+
+
+def test_not_equal_when_capacity_changed() -> None:
+    """The recording capacity is part of what is shown."""
+    box = _box()
+    assert _snapshot(box, 10) != _snapshot(box, 11)
+
+
+def test_artwork_identity_follows_the_programme() -> None:
+    """The stream image of a channel changes identity with the programme."""
+    box = _box()
+    before = _snapshot(box)
+    box.playing_info.set_title("Nieuwsuur")
+    after = _snapshot(box)
+    assert before.image == after.image
+    assert before.image_hash != after.image_hash
+
+
+def test_immutable() -> None:
+    """A snapshot can not be changed once taken."""
+    snapshot = _snapshot(_box())
+    with pytest.raises(AttributeError):
+        snapshot.title = "Changed"
+    with pytest.raises(AttributeError):
+        del snapshot.title
+    with pytest.raises(TypeError):
+        snapshot.attributes["title"] = "Changed"
+
+
+def test_not_equal_to_other_types() -> None:
+    """Comparing with something else than a snapshot is not supported."""
+    assert _snapshot(_box()) != datetime(2024, 1, 1)